@@ -0,0 +1,81 @@
+import logging
+import threading
+import unicodedata
+
+from sqlalchemy import select
+
+from . import models, database, catalogue
+
+logger = logging.getLogger(__name__)
+
+# Vérification des réponses côté serveur : correcte n'est plus fourni par le client.
+# enigme.solution (jamais renvoyée par l'API) accepte plusieurs variantes séparées par "|".
+SEPARATOR = "|"
+
+
+def normalize(text):
+    """Casse, accents et espaces ignorés : '  Éléphant  rose ' -> 'elephant rose'"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(without_accents.casefold().split())
+
+
+class AnswerIndex:
+    """id_salle -> {réponse normalisée: id_enigme}, et points de chaque énigme"""
+
+    def __init__(self):
+        self._solutions = {}
+        self._points = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        solutions, points = {}, {}
+        with database.engine.connect() as conn:
+            rows = conn.execute(
+                select(models.Enigme.id_enigme, models.Enigme.id_salle, models.Enigme.solution, models.Enigme.points)
+                .where(models.Enigme.solution.is_not(None))
+            )
+            for id_enigme, id_salle, solution, enigme_points in rows:
+                expected = solutions.setdefault(id_salle, {})
+                for variant in solution.split(SEPARATOR):
+                    if normalize(variant):
+                        expected[normalize(variant)] = id_enigme
+                points[id_enigme] = enigme_points
+        with self._lock:
+            self._solutions, self._points = solutions, points
+
+    def match(self, id_salle, saisie):
+        """id_enigme résolue par la saisie, ou None"""
+        if saisie is None:
+            return None
+        return self._solutions.get(id_salle, {}).get(normalize(saisie))
+
+    def check(self, id_salle, saisie):
+        """True / False ; None si aucune solution n'est connue pour la salle"""
+        if not self._solutions.get(id_salle):
+            return None
+        return self.match(id_salle, saisie) is not None
+
+    def points(self, id_enigme):
+        return self._points.get(id_enigme)
+
+
+index = AnswerIndex()
+
+
+def with_correcte(values: dict):
+    """Valeurs d'une réponse complétées par correcte, calculé depuis l'index"""
+    values["correcte"] = index.check(values["id_salle"], values.get("reponse_saisie"))
+    return values
+
+
+def _on_invalidation(table):
+    # Écriture sur les énigmes (ou salle supprimée en cascade), ici ou sur un autre worker
+    if table == "enigme":
+        try:
+            index.load()
+        except Exception:
+            logger.exception("Rechargement des solutions impossible")
+
+
+catalogue.bus.subscribe(_on_invalidation)
@@ -0,0 +1,220 @@
+import inspect
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import List
+
+from . import (
+    models, schemas, auth, pagination, streaming, catalogue, queries, fastjson, leaderboard, clock, events,
+    writebehind, answers, scoring,
+)
+
+# Routes CRUD asynchrones, activées par ASYNC_DB=true à la place de celles de main.py :
+# aucune requête n'occupe un thread du threadpool pendant son aller-retour en base.
+router = APIRouter()
+
+
+# DÉPENDANCES
+
+# Même dépendance que auth.get_current_user_async : FastAPI la résout une fois, la route et
+# l'authentification partagent la session
+get_db = auth.get_async_db
+
+
+def _on_loop(dependency):
+    """Dépendance synchrone sans E/S (paramètres de page, filtres) exécutée sur la boucle :
+    FastAPI enverrait sinon chaque appel dans le threadpool"""
+    async def call(**kwargs):
+        return dependency(**kwargs)
+
+    call.__signature__ = inspect.signature(dependency)
+    return call
+
+
+page_params = _on_loop(pagination.Page)
+bounded_page_params = _on_loop(pagination.BoundedPage)
+
+
+def _crud(path, model, pk, create_schema, response_schema, not_found, deleted,
+          ops=("list", "get", "create", "update", "delete"), filters=pagination.no_filters, streamable=False,
+          cached=False, patch_schema=None, cascades=()):
+    """Enregistre les routes CRUD d'une entité, avec la même sémantique que main.py"""
+    pk_col = getattr(model, pk)
+    name = model.__tablename__
+    filters = _on_loop(filters)
+    # Tables exportables en flux : la liste est toujours paginée
+    pages = bounded_page_params if streamable else page_params
+
+    async def _bump(db):
+        if cached:
+            await db.execute(catalogue.bump_statement(name))
+
+    async def _invalidate(db):
+        if cached:
+            await catalogue.invalidate_async(db, name)
+
+    async def _written(db, obj):
+        """Après commit : horloge et événements de la partie concernée"""
+        if model is models.Partie:
+            clock.clock.changed(obj)
+            await events.partie_changed_async(db, obj)
+        elif model is models.Responses:
+            id_game = (await db.execute(
+                select(models.Joueurs.id_game).where(models.Joueurs.id_joueur == obj.id_joueur)
+            )).scalar()
+            await events.reponse_created_async(db, id_game, obj)
+
+    async def _update(db, id, values: dict):
+        """UPDATE ... RETURNING et commit ; pour une réponse, correcte et gain recalculés (scoring.py)"""
+        if model is models.Responses:
+            row = await db.run_sync(scoring.update_response, id, values)
+        else:
+            row = (await db.execute(queries.update_returning(model, id, values))).first()
+            if row is not None:
+                await _bump(db)
+                await db.commit()
+                await _invalidate(db)
+        if row is None:
+            raise HTTPException(status_code=404, detail=not_found)
+        return row
+
+    async def _get_or_404(db, id):
+        obj = await db.get(model, id)
+        if obj is None:
+            raise HTTPException(status_code=404, detail=not_found)
+        return obj
+
+    if "list" in ops:
+        async def list_items(request: Request, response: Response, page: pagination.Page = Depends(pages),
+                             filters: dict = Depends(filters), stream: bool = False,
+                             db: AsyncSession = Depends(get_db)):
+            if streamable and streaming.wants_stream(request, stream):
+                return streaming.export_async(request, model, pk_col, filters, response_schema)
+            stmt = pagination.filter_by(select(model), model, filters)
+            if cached:
+                async def load():
+                    if fastjson.FAST_JSON:
+                        return await fastjson.fetch_page_async(db, model, response_schema, page, filters)
+                    items = (await db.execute(page.apply(stmt, pk_col))).scalars().all()
+                    return catalogue.dump(List[response_schema], items), page.headers(items, pk_col)
+
+                key = page.key() + tuple(filters.items())
+                return await catalogue.read_through_async(request, db, name, key, load)
+            if fastjson.FAST_JSON:
+                return fastjson.render(*await fastjson.fetch_page_async(db, model, response_schema, page, filters))
+            items = (await db.execute(page.apply(stmt, pk_col))).scalars().all()
+            page.set_next(response, items, pk_col)
+            return items
+
+        router.add_api_route(path, list_items, methods=["GET"], response_model=List[response_schema],
+                             name=f"list_{name}_async")
+
+    if "get" in ops:
+        async def get_item(id: int, request: Request, db: AsyncSession = Depends(get_db)):
+            if cached:
+                async def load():
+                    return catalogue.dump(response_schema, await _get_or_404(db, id)), {}
+
+                return await catalogue.read_through_async(request, db, name, id, load)
+            return await _get_or_404(db, id)
+
+        router.add_api_route(f"{path}/{{id}}", get_item, methods=["GET"], response_model=response_schema,
+                             name=f"get_{name}_async")
+
+    if "create" in ops:
+        async def create_item(item: create_schema, db: AsyncSession = Depends(get_db),
+                              current_user: schemas.JoueurResponse = Depends(auth.get_current_user_async)):
+            if model is models.Responses and writebehind.WRITE_BEHIND:
+                return await run_in_threadpool(writebehind.submit, item)
+            if model is models.Responses:
+                # Score du joueur crédité dans la même transaction que l'INSERT
+                row = (await db.run_sync(scoring.insert_responses, [answers.with_correcte(item.dict())]))[0]
+                await _written(db, row)
+                return row._asdict()
+            obj = model(**item.dict())
+            db.add(obj)
+            await _bump(db)
+            await db.commit()
+            await _invalidate(db)
+            await db.refresh(obj)
+            await _written(db, obj)
+            return obj
+
+        router.add_api_route(path, create_item, methods=["POST"], response_model=response_schema,
+                             name=f"create_{name}_async")
+
+    if "update" in ops:
+        async def update_item(id: int, updated: create_schema, db: AsyncSession = Depends(get_db),
+                              current_user: schemas.JoueurResponse = Depends(auth.get_current_user_async)):
+            row = await _update(db, id, updated.dict())
+            if model is models.Partie:
+                await _written(db, row)
+            return row._asdict()
+
+        router.add_api_route(f"{path}/{{id}}", update_item, methods=["PUT"], response_model=response_schema,
+                             name=f"update_{name}_async")
+
+    if patch_schema is not None:
+        async def patch_item(id: int, updated: patch_schema, db: AsyncSession = Depends(get_db),
+                             current_user: schemas.JoueurResponse = Depends(auth.get_current_user_async)):
+            row = await _update(db, id, queries.patch_values(model, updated))
+            if model is models.Partie:
+                await _written(db, row)
+            return row._asdict()
+
+        router.add_api_route(f"{path}/{{id}}", patch_item, methods=["PATCH"], response_model=response_schema,
+                             name=f"patch_{name}_async")
+
+    if "delete" in ops:
+        async def delete_item(id: int, db: AsyncSession = Depends(get_db),
+                              current_user: schemas.JoueurResponse = Depends(auth.get_current_user_async)):
+            # DELETE direct : pas de chargement paresseux des relations (interdit en async)
+            if model is models.Responses:
+                # Gain de la réponse retiré du score, commit compris
+                if not await db.run_sync(scoring.delete_response, id):
+                    raise HTTPException(status_code=404, detail=not_found)
+                return {"message": deleted}
+            if (await db.execute(queries.delete_returning(model, id))).first() is None:
+                raise HTTPException(status_code=404, detail=not_found)
+            await _bump(db)
+            # Tables du catalogue vidées en cascade par ON DELETE
+            for table in cascades:
+                await db.execute(catalogue.bump_statement(table))
+            await db.commit()
+            await _invalidate(db)
+            for table in cascades:
+                await catalogue.invalidate_async(db, table)
+            if model is models.Joueurs:
+                auth.invalidate_user(id)
+                leaderboard.board.remove(id)
+            if model is models.Partie:
+                clock.clock.deleted(id)
+                await events.partie_deleted_async(db, id)
+            return {"message": deleted}
+
+        router.add_api_route(f"{path}/{{id}}", delete_item, methods=["DELETE"], name=f"delete_{name}_async")
+
+
+_crud("/salles", models.Salles, "id_salle", schemas.SalleCreate, schemas.SalleResponse,
+      "Salle introuvable", "Salle supprimée", cached=True,
+      patch_schema=schemas.SalleUpdate, cascades=("enigme",))
+_crud("/enigmes", models.Enigme, "id_enigme", schemas.EnigmeCreate, schemas.EnigmeResponse,
+      "Enigme introuvable", "Enigme supprimée", ops=("list", "create", "update", "delete"),
+      filters=pagination.enigme_filters, cached=True, patch_schema=schemas.EnigmeUpdate)
+_crud("/medicaments", models.Medicaments, "id_medoc", schemas.MedicamentCreate, schemas.MedicamentResponse,
+      "Médicament introuvable", "Médicament supprimé", ops=("list", "create", "update", "delete"),
+      cached=True, patch_schema=schemas.MedicamentUpdate, cascades=("maladies",))
+_crud("/maladies", models.Maladies, "id_mal", schemas.MaladieCreate, schemas.MaladieResponse,
+      "Maladie introuvable", "Maladie supprimée", ops=("list", "create", "update", "delete"),
+      filters=pagination.maladie_filters, cached=True, patch_schema=schemas.MaladieUpdate)
+_crud("/parties", models.Partie, "id_game", schemas.PartieCreate, schemas.PartieResponse,
+      "Partie introuvable", "Partie supprimée", ops=("list", "create", "update", "delete"),
+      filters=pagination.partie_filters, patch_schema=schemas.PartieUpdate)
+_crud("/joueurs", models.Joueurs, "id_joueur", None, schemas.JoueurResponse,
+      "Joueur introuvable", "Joueur supprimé", ops=("list", "get", "delete"),
+      filters=pagination.joueur_filters, streamable=True)
+_crud("/reponses", models.Responses, "id_resp", schemas.ReponseCreate, schemas.ReponseResponse,
+      "Réponse introuvable", "Réponse supprimée", ops=("list", "create", "update", "delete"),
+      filters=pagination.reponse_filters, streamable=True, patch_schema=schemas.ReponseUpdate)
@@ -1,15 +1,19 @@
 from datetime import datetime, timedelta
 from typing import Optional
 import os
+import time
 
 from fastapi import Depends, HTTPException, status, APIRouter
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
-from . import models, schemas, database
+from . import models, schemas, database, hashing, leaderboard
+from .cache import TTLCache
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -17,12 +21,22 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+# Mode sans état : id_joueur signé dans le JWT (la version l'est dans tous les modes)
+STATELESS_AUTH = os.getenv("STATELESS_AUTH", "false").lower() in ("1", "true", "yes")
+TOKEN_VERSION_TTL = int(os.getenv("TOKEN_VERSION_TTL", 30))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = hashing.pwd_context
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 router = APIRouter(tags=["Authentification"])
 
+# Cache des tokens déjà vérifiés : token -> (claims, joueur), expire au "exp" du token
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE)
+# Version courante des tokens par joueur : id_joueur -> version (None si joueur supprimé)
+token_version_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE)
+_MISSING = object()
+
 # Dépendance DB (importée depuis database.py)
 def get_db():
     db = database.SessionLocal()
@@ -32,6 +46,12 @@ def get_db():
         db.close()
 
 
+# Variante AsyncSession, partagée avec async_routes.py : une seule session par requête
+async def get_async_db():
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+
 # Vérification / hachage
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -41,6 +61,15 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+# Versions asynchrones : le calcul bcrypt part dans l'exécuteur dédié (hashing.py)
+async def verify_password_async(plain_password, hashed_password):
+    return await hashing.verify_password(plain_password, hashed_password)
+
+
+async def get_password_hash_async(password):
+    return await hashing.hash_password(password)
+
+
 # Gestion du token JWT
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -50,15 +79,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def verify_token(token: str):
+def decode_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Token invalide")
-        return username
     except JWTError:
         raise HTTPException(status_code=401, detail="Token invalide ou expiré")
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Token invalide")
+    return payload
+
+
+def verify_token(token: str):
+    return decode_token(token)["sub"]
 
 
 # Gestion utilisateur
@@ -66,54 +98,179 @@ def get_user_by_username(db: Session, username: str):
     return db.query(models.Joueurs).filter(models.Joueurs.username == username).first()
 
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user_by_username(db, username)
-    if not user or not verify_password(password, user.password):
+async def authenticate_user(db: Session, username: str, password: str):
+    user = await run_in_threadpool(get_user_by_username, db, username)
+    if not user or not await verify_password_async(password, user.password):
         return False
     return user
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    username = verify_token(token)
-    user = get_user_by_username(db, username)
+# Version des tokens (révocation par /logout)
+def _token_version_statement(id_joueur: int):
+    return (
+        select(models.Joueurs.id_joueur, models.TokenVersion.version)
+        .outerjoin(models.TokenVersion, models.TokenVersion.id_joueur == models.Joueurs.id_joueur)
+        .where(models.Joueurs.id_joueur == id_joueur)
+    )
+
+
+def _cache_token_version(id_joueur: int, row):
+    version = None if row is None else (row.version or 0)
+    token_version_cache.set(id_joueur, version, time.time() + TOKEN_VERSION_TTL)
+    return version
+
+
+def get_token_version(db: Session, id_joueur: int):
+    """Version courante des tokens du joueur, ou None s'il n'existe plus"""
+    version = token_version_cache.get(id_joueur, _MISSING)
+    if version is not _MISSING:
+        return version
+    return read_token_version(db, id_joueur)
+
+
+def read_token_version(db: Session, id_joueur: int):
+    """Version courante lue en base (sans le cache), qui rafraîchit le cache du worker"""
+    return _cache_token_version(id_joueur, db.execute(_token_version_statement(id_joueur)).first())
+
+
+async def get_token_version_async(db: AsyncSession, id_joueur: int):
+    version = token_version_cache.get(id_joueur, _MISSING)
+    if version is not _MISSING:
+        return version
+    return _cache_token_version(id_joueur, (await db.execute(_token_version_statement(id_joueur))).first())
+
+
+def revoke_tokens(db: Session, id_joueur: int):
+    """Invalide tous les tokens déjà émis pour ce joueur"""
+    updated = (
+        db.query(models.TokenVersion)
+        .filter(models.TokenVersion.id_joueur == id_joueur)
+        .update({models.TokenVersion.version: models.TokenVersion.version + 1})
+    )
+    if not updated:
+        db.add(models.TokenVersion(id_joueur=id_joueur, version=1))
+    db.commit()
+    invalidate_user(id_joueur)
+
+
+def _cached_identity(token: str):
+    """(claims, joueur) sans requête en base ; joueur vaut None s'il faut le lire par username"""
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    payload = decode_token(token)
+    if "id_joueur" not in payload:
+        return payload, None
+    # Token complet : l'identité est dans les claims, pas de requête en base
+    joueur = schemas.Principal(id_joueur=payload["id_joueur"], username=payload["sub"])
+    token_cache.set(token, (payload, joueur), payload.get("exp"))
+    return payload, joueur
+
+
+def _remember(token: str, payload: dict, user):
     if user is None:
         raise HTTPException(status_code=404, detail="Utilisateur introuvable")
-    return user
+    # Instantané détaché de la session : réutilisable d'une requête à l'autre
+    joueur = schemas.JoueurResponse.model_validate(user, from_attributes=True)
+    token_cache.set(token, (payload, joueur), payload.get("exp"))
+    return joueur
+
+
+def _check_version(payload: dict, version):
+    if payload["ver"] != version:
+        raise HTTPException(status_code=401, detail="Token révoqué")
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    payload, joueur = _cached_identity(token)
+    if joueur is None:
+        joueur = _remember(token, payload, get_user_by_username(db, payload["sub"]))
+    if "ver" in payload:
+        _check_version(payload, get_token_version(db, joueur.id_joueur))
+    return joueur
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """Même contrôle que get_current_user, pour les routes ASYNC_DB : ni thread du threadpool
+    ni connexion du pool synchrone, et la session est celle de la route"""
+    payload, joueur = _cached_identity(token)
+    if joueur is None:
+        user = (await db.execute(
+            select(models.Joueurs).where(models.Joueurs.username == payload["sub"])
+        )).scalar_one_or_none()
+        joueur = _remember(token, payload, user)
+    if "ver" in payload:
+        _check_version(payload, await get_token_version_async(db, joueur.id_joueur))
+    return joueur
+
+
+def invalidate_user(id_joueur: int):
+    """Oublie tous les tokens en cache d'un joueur (ex : après suppression)"""
+    token_cache.invalidate_where(lambda entry: entry[1].id_joueur == id_joueur)
+    token_version_cache.invalidate(id_joueur)
 
 
 # Routes d'authentification
+def _insert_user(db: Session, new_user: models.Joueurs):
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+    leaderboard.board.update(new_user.id_joueur, new_user.username, new_user.score)
+    return new_user
+
+
 @router.post("/signup", response_model=schemas.JoueurResponse)
-def signup(joueur: schemas.JoueurCreate, db: Session = Depends(get_db)):
+async def signup(joueur: schemas.JoueurCreate, db: Session = Depends(get_db)):
     """Créer un nouveau joueur"""
-    existing_user = db.query(models.Joueurs).filter(models.Joueurs.username == joueur.username).first()
+    existing_user = await run_in_threadpool(get_user_by_username, db, joueur.username)
     if existing_user:
         raise HTTPException(status_code=400, detail="Nom d'utilisateur déjà pris")
 
-    hashed_pwd = get_password_hash(joueur.password)
+    hashed_pwd = await get_password_hash_async(joueur.password)
     new_user = models.Joueurs(
         username=joueur.username,
         email=joueur.email,
         password=hashed_pwd,
         score=0
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+    return await run_in_threadpool(_insert_user, db, new_user)
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """Connexion et génération du JWT"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=401, detail="Identifiants incorrects")
 
-    access_token = create_access_token(data={"sub": user.username})
+    # Version signée dans tous les modes : /logout révoque aussi les tokens classiques.
+    # Lue en base, pas dans le cache du worker : un /logout passé par un autre worker l'a peut-être changée
+    claims = {"sub": user.username, "ver": await run_in_threadpool(read_token_version, db, user.id_joueur)}
+    if STATELESS_AUTH:
+        # Pas d'id_game : il change à chaque partie rejointe, le token le garderait périmé
+        claims["id_joueur"] = user.id_joueur
+    access_token = create_access_token(data=claims)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+@router.post("/logout")
+def logout(token: str = Depends(oauth2_scheme), current_user: schemas.JoueurResponse = Depends(get_current_user),
+           db: Session = Depends(get_db)):
+    """Révoquer tous les tokens du joueur connecté"""
+    payload, _ = _cached_identity(token)
+    if "ver" not in payload:
+        # Token émis sans version : rien ne permettrait de le refuser ensuite
+        raise HTTPException(status_code=400, detail="Token non révocable, reconnectez-vous pour en obtenir un nouveau")
+    revoke_tokens(db, current_user.id_joueur)
+    return {"message": "Déconnexion effectuée"}
+
+
 @router.get("/me", response_model=schemas.JoueurResponse)
-def read_users_me(current_user: schemas.JoueurResponse = Depends(get_current_user)):
+def read_users_me(current_user: schemas.JoueurResponse = Depends(get_current_user),
+                  db: Session = Depends(get_db)):
     """Récupérer les infos du joueur connecté"""
-    return current_user
+    # Relecture par clé primaire : l'instantané en cache peut avoir un score périmé
+    user = db.get(models.Joueurs, current_user.id_joueur)
+    if user is None:
+        raise HTTPException(status_code=404, detail="Utilisateur introuvable")
+    return user
@@ -0,0 +1,75 @@
+"""POST /reponses avec et sans écriture différée, sur une base SQLite jetable.
+
+Depuis le dossier parent du dépôt :  python -m <paquet>.benchmarks.writebehind -n 500
+"""
+import argparse
+import os
+import tempfile
+import time
+
+# Base jetable : à définir avant d'importer l'application
+_DB = os.path.join(tempfile.mkdtemp(prefix="escape-bench-"), "bench.db")
+os.environ.update({
+    "SECRET_KEY": "bench",
+    "DATABASE_URL": f"sqlite:///{_DB}",
+    "CATALOGUE_BUS": "local",
+    "LEADERBOARD_REFRESH": "0",
+})
+
+from fastapi.testclient import TestClient
+
+from .. import main, writebehind
+
+
+def _post(client, headers, body, n):
+    for _ in range(n):
+        response = client.post("/reponses", json=body, headers=headers)
+        response.raise_for_status()
+
+
+def _settled(target):
+    """Attend que la file ait tout écrit (ou abandonné) : le chronomètre s'arrête là, pas à stop()"""
+    while True:
+        stats = writebehind.stats()
+        if stats["flushed"] + stats["failed"] >= target:
+            return
+        time.sleep(0.001)
+
+
+def run(n):
+    with TestClient(main.app) as client:
+        client.post("/signup", json={"username": "bench", "password": "bench"})
+        token = client.post("/login", data={"username": "bench", "password": "bench"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        id_salle = client.post("/salles", json={"name": "Bench"}, headers=headers).json()["id_salle"]
+        id_joueur = client.get("/me", headers=headers).json()["id_joueur"]
+        body = {"id_salle": id_salle, "id_joueur": id_joueur, "reponse_saisie": "x"}
+        _post(client, headers, body, 10)
+
+        start = time.perf_counter()
+        _post(client, headers, body, n)
+        direct = time.perf_counter() - start
+
+        writebehind.WRITE_BEHIND = True
+        writebehind.start()
+        before = writebehind.stats()
+        start = time.perf_counter()
+        _post(client, headers, body, n)
+        accepted = time.perf_counter() - start
+        # Vidage complet de la file : réponses toutes en base
+        _settled(before["flushed"] + before["failed"] + n)
+        flushed = time.perf_counter() - start
+        writebehind.stop()
+        stats = writebehind.stats()
+        writebehind.WRITE_BEHIND = False
+
+    print(f"{n} réponses")
+    print(f"  INSERT direct      : {n / direct:8.0f} req/s")
+    print(f"  écriture différée  : {n / accepted:8.0f} req/s acceptées, {n / flushed:8.0f} req/s jusqu'en base")
+    print(f"  {stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=500, help="réponses envoyées par mode")
+    run(parser.parse_args().n)
@@ -0,0 +1,103 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import insert, tuple_, update
+from sqlalchemy.orm import Session
+from typing import List
+from dotenv import load_dotenv
+import os
+
+from . import models, schemas, database, auth, catalogue
+
+# Charger les variables d'environnement
+load_dotenv()
+
+BULK_MAX = int(os.getenv("BULK_MAX", 5000))
+
+# Import de scénarios : un lot entier en une transaction, quelques requêtes au total
+router = APIRouter(tags=["Import"])
+
+
+# DÉPENDANCE BASE DE DONNÉES
+
+def get_db():
+    db = database.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def bulk_upsert(db: Session, model, items, natural_key, upsert: bool):
+    """INSERT ... RETURNING en executemany ; avec upsert, les lignes existantes
+    (même clé naturelle) sont mises à jour au lieu d'être dupliquées."""
+    if len(items) > BULK_MAX:
+        raise HTTPException(status_code=413, detail=f"Lot limité à {BULK_MAX} éléments")
+    table = model.__table__
+    pk = table.primary_key.columns.values()[0]
+    rows = [item.dict() for item in items]
+    results = [None] * len(rows)
+    to_insert = list(range(len(rows)))
+
+    if upsert and rows:
+        keys = [tuple(row[col] for col in natural_key) for row in rows]
+        if len(set(keys)) != len(keys):
+            raise HTTPException(status_code=400, detail="Clé en double dans le lot")
+        key_cols = [table.c[col] for col in natural_key]
+        if len(key_cols) == 1:
+            condition = key_cols[0].in_([key[0] for key in keys])
+        else:
+            condition = tuple_(*key_cols).in_(keys)
+        existing = {
+            tuple(row[1:]): row[0]
+            for row in db.execute(table.select().with_only_columns(pk, *key_cols).where(condition))
+        }
+        updates = []
+        to_insert = []
+        for i, key in enumerate(keys):
+            if key in existing:
+                results[i] = {**rows[i], pk.name: existing[key]}
+                updates.append(results[i])
+            else:
+                to_insert.append(i)
+        if updates:
+            # UPDATE groupé par clé primaire (executemany)
+            db.execute(update(model), updates)
+
+    if to_insert:
+        inserted = db.execute(
+            insert(table).returning(*table.c, sort_by_parameter_order=True),
+            [rows[i] for i in to_insert],
+        )
+        for i, row in zip(to_insert, inserted):
+            results[i] = dict(row._mapping)
+
+    catalogue.bump(db, table.name)
+    db.commit()
+    return results
+
+
+@router.post("/salles/bulk", response_model=List[schemas.SalleResponse])
+def bulk_salles(salles: List[schemas.SalleCreate], upsert: bool = False, db: Session = Depends(get_db),
+                current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
+    """Créer (ou mettre à jour par nom avec ?upsert=true) plusieurs salles"""
+    return bulk_upsert(db, models.Salles, salles, ("name",), upsert)
+
+
+@router.post("/enigmes/bulk", response_model=List[schemas.EnigmeResponse])
+def bulk_enigmes(enigmes: List[schemas.EnigmeCreate], upsert: bool = False, db: Session = Depends(get_db),
+                 current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
+    """Créer (ou mettre à jour par salle et nom avec ?upsert=true) plusieurs énigmes"""
+    return bulk_upsert(db, models.Enigme, enigmes, ("id_salle", "name"), upsert)
+
+
+@router.post("/medicaments/bulk", response_model=List[schemas.MedicamentResponse])
+def bulk_medicaments(medocs: List[schemas.MedicamentCreate], upsert: bool = False, db: Session = Depends(get_db),
+                     current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
+    """Créer (ou mettre à jour par nom avec ?upsert=true) plusieurs médicaments"""
+    return bulk_upsert(db, models.Medicaments, medocs, ("name",), upsert)
+
+
+@router.post("/maladies/bulk", response_model=List[schemas.MaladieResponse])
+def bulk_maladies(maladies: List[schemas.MaladieCreate], upsert: bool = False, db: Session = Depends(get_db),
+                  current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
+    """Créer (ou mettre à jour par nom avec ?upsert=true) plusieurs maladies"""
+    return bulk_upsert(db, models.Maladies, maladies, ("name",), upsert)
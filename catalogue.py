@@ -0,0 +1,269 @@
+import logging
+import os
+import select
+import threading
+from functools import lru_cache
+
+from starlette.concurrency import run_in_threadpool
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import event, insert, select as sql_select, text, update
+from dotenv import load_dotenv
+
+from . import database, models
+from .cache import TTLCache
+
+# Charger les variables d'environnement
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_CACHE_SIZE = int(os.getenv("CATALOGUE_CACHE_SIZE", 256))
+# "postgres" (LISTEN/NOTIFY entre workers) ou "local" (un seul processus, tests)
+CATALOGUE_BUS = os.getenv(
+    "CATALOGUE_BUS", "postgres" if database.engine.dialect.name == "postgresql" else "local"
+)
+CATALOGUE_CHANNEL = os.getenv("CATALOGUE_CHANNEL", "catalogue_invalidation")
+
+# Contenu du jeu : ne change que par les routes d'administration
+TABLES = ("salles", "enigme", "medicaments", "maladies")
+
+_caches = {table: TTLCache(maxsize=CATALOGUE_CACHE_SIZE) for table in TABLES}
+# Incrémenté à chaque invalidation : une lecture commencée avant n'est pas mise en cache
+_generations = {table: 0 for table in TABLES}
+# Version de chaque table (table_versions), lue en base une fois par invalidation
+_versions = {}
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema):
+    return TypeAdapter(schema)
+
+
+def dump(schema, data):
+    """Sérialise des objets ORM en JSON (bytes) selon le schéma de réponse"""
+    adapter = _adapter(schema)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+
+def _render(entry, etag):
+    body, headers = entry
+    return Response(content=body, media_type="application/json", headers={**headers, "ETag": etag})
+
+
+def _not_modified(request: Request, etag):
+    """Vrai si l'un des ETags de If-None-Match correspond (comparaison faible, RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def read_through(request: Request, table, key, load):
+    """Réponse JSON en cache ; load() -> (corps, en-têtes) n'est appelé qu'en cas d'absence
+
+    Un client qui présente l'ETag courant reçoit un 304 sans requête ni sérialisation.
+    """
+    # Version lue avant les données : les données servies sont au moins aussi récentes
+    etag = f'"{table}-{version(table)}"'
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    entry = _caches[table].get(key)
+    if entry is None:
+        generation = _generations[table]
+        entry = load()
+        _store(table, key, generation, entry)
+    return _render(entry, etag)
+
+
+async def read_through_async(request: Request, db, table, key, load):
+    """Variante ASYNC_DB de read_through : version lue par l'AsyncSession de la requête"""
+    etag = f'"{table}-{await version_async(db, table)}"'
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    entry = _caches[table].get(key)
+    if entry is None:
+        generation = _generations[table]
+        entry = await load()
+        _store(table, key, generation, entry)
+    return _render(entry, etag)
+
+
+def _store(table, key, generation, entry):
+    with _lock:
+        if _generations[table] == generation:
+            _caches[table].set(key, entry)
+
+
+def invalidate_local(table):
+    with _lock:
+        _generations[table] += 1
+        _caches[table].clear()
+        _versions.pop(table, None)
+
+
+def invalidate(table):
+    """À appeler après le commit d'une écriture sur une table du catalogue"""
+    invalidate_local(table)
+    bus.publish(table)
+
+
+async def invalidate_async(db, table):
+    """Variante ASYNC_DB de invalidate : NOTIFY par l'AsyncSession de la requête"""
+    invalidate_local(table)
+    await bus.publish_async(db, table)
+
+
+# Versions des tables (ETag)
+
+def ensure_versions():
+    """Crée les lignes manquantes de table_versions (au démarrage)"""
+    with database.engine.begin() as conn:
+        existing = set(conn.execute(sql_select(models.TableVersion.table_name)).scalars())
+        missing = [{"table_name": table, "version": 0} for table in TABLES if table not in existing]
+        if missing:
+            conn.execute(insert(models.TableVersion), missing)
+
+
+def _version_statement(table):
+    return sql_select(models.TableVersion.version).where(models.TableVersion.table_name == table)
+
+
+def _remember_version(table, generation, value):
+    with _lock:
+        if _generations[table] == generation:
+            _versions[table] = value
+    return value
+
+
+def version(table):
+    value = _versions.get(table)
+    if value is None:
+        generation = _generations[table]
+        with database.engine.connect() as conn:
+            value = _remember_version(table, generation, conn.execute(_version_statement(table)).scalar() or 0)
+    return value
+
+
+async def version_async(db, table):
+    value = _versions.get(table)
+    if value is None:
+        generation = _generations[table]
+        value = _remember_version(table, generation, (await db.execute(_version_statement(table))).scalar() or 0)
+    return value
+
+
+def bump_statement(table):
+    return (
+        update(models.TableVersion)
+        .where(models.TableVersion.table_name == table)
+        .values(version=models.TableVersion.version + 1)
+    )
+
+
+def bump(db, table):
+    """Incrémente la version dans la transaction en cours ; invalide les caches au commit"""
+    db.execute(bump_statement(table))
+    event.listen(db, "after_commit", lambda session: invalidate(table), once=True)
+
+
+# Canal d'invalidation entre workers (réutilisé par events.py sur son propre canal)
+
+class LocalBus:
+    """Diffusion en mémoire : remplace LISTEN/NOTIFY quand il n'y a qu'un processus"""
+
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def publish(self, payload):
+        for callback in self.subscribers:
+            callback(payload)
+
+    async def publish_async(self, db, payload):
+        # Abonnés synchrones (rechargement des index) : hors de la boucle
+        await run_in_threadpool(self.publish, payload)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class PostgresBus:
+    """NOTIFY après chaque écriture, LISTEN dans un thread par worker"""
+
+    def __init__(self, engine, channel, replay=()):
+        self.engine = engine
+        self.channel = channel
+        # Messages rejoués à chaque (re)connexion : des notifications ont pu être manquées
+        self.replay = replay
+        self.subscribers = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def publish(self, payload):
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": payload})
+            conn.commit()
+
+    async def publish_async(self, db, payload):
+        """NOTIFY par l'AsyncSession de la requête (ASYNC_DB), sans passer par l'engine synchrone"""
+        await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": payload})
+        await db.commit()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name=f"{self.channel}-listen", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _listen(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                # Connexion dédiée, sortie du pool pour toute la durée du LISTEN
+                conn = self.engine.raw_connection()
+                conn.detach()
+                pg = conn.driver_connection
+                pg.autocommit = True
+                pg.cursor().execute(f'LISTEN "{self.channel}"')
+                for payload in self.replay:
+                    self._dispatch(payload)
+                while not self._stop.is_set():
+                    if select.select([pg], [], [], 1.0)[0]:
+                        pg.poll()
+                        while pg.notifies:
+                            self._dispatch(pg.notifies.pop(0).payload)
+            except Exception:
+                logger.exception("Écoute du canal %s interrompue", self.channel)
+                self._stop.wait(1.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _dispatch(self, payload):
+        for callback in self.subscribers:
+            callback(payload)
+
+
+def _on_invalidation(table):
+    if table in TABLES:
+        invalidate_local(table)
+
+
+bus = PostgresBus(database.engine, CATALOGUE_CHANNEL, replay=TABLES) if CATALOGUE_BUS == "postgres" else LocalBus()
+bus.subscribe(_on_invalidation)
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+
+from . import models, database
+
+# Charger les variables d'environnement
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Horloge de partie côté serveur : temps_restant = duree - (maintenant - date_debut),
+# calculé à la lecture au lieu d'être décrémenté par les clients à chaque seconde.
+CLOCK_TICK = float(os.getenv("CLOCK_TICK", 1))
+# Relecture des parties suivies (secondes) : rattrape les écritures des autres workers
+CLOCK_RESYNC = float(os.getenv("CLOCK_RESYNC", 30))
+CLOCK_QUEUE = int(os.getenv("CLOCK_QUEUE", 16))
+
+router = APIRouter(tags=["Horloge"])
+
+
+def utcnow():
+    # Colonnes DateTime sans fuseau : dates stockées en UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def remaining(date_debut, duree, temps_restant=None, now=None):
+    """Secondes restantes ; valeur stockée telle quelle si la partie n'a pas d'horloge"""
+    if date_debut is None or duree is None:
+        return temps_restant
+    now = now or utcnow()
+    if date_debut.tzinfo is not None:
+        now = now.replace(tzinfo=timezone.utc)
+    elapsed = int((now - date_debut).total_seconds())
+    return max(0, min(duree, duree - elapsed))
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def apply(data: dict):
+    """Remplace temps_restant par sa valeur calculée dans une ligne sérialisée"""
+    data["temps_restant"] = remaining(data.get("date_debut"), data.get("duree"), data.get("temps_restant"))
+    return data
+
+
+class Clock:
+    """Un ordonnanceur par worker : une tâche asyncio pousse l'état des parties suivies à chaque tick"""
+
+    def __init__(self):
+        # id_game -> (date_debut, duree, temps_restant stocké) ; None = partie supprimée
+        self._parties = {}
+        self._subscribers = defaultdict(set)
+        self._last = {}
+        self._task = None
+        self._loop = None
+
+    # Écritures (appelées depuis les handlers, éventuellement dans le threadpool)
+
+    def changed(self, partie):
+        """partie : objet ORM ou ligne RETURNING, lue ici ; l'état est mis à jour sur la boucle"""
+        self._on_loop(self._set, partie.id_game, (partie.date_debut, partie.duree, partie.temps_restant))
+
+    def deleted(self, id_game: int):
+        self._on_loop(self._set, id_game, None)
+
+    def _on_loop(self, callback, *args):
+        # Les dictionnaires parcourus par tick() ne sont modifiés que depuis la boucle (comme events.py)
+        loop = self._loop
+        if loop is None or _running_loop() is loop:
+            callback(*args)
+        else:
+            loop.call_soon_threadsafe(callback, *args)
+
+    def _set(self, id_game, partie):
+        if id_game in self._subscribers:
+            self._parties[id_game] = partie
+
+    # Abonnements
+
+    async def subscribe(self, id_game: int):
+        if id_game not in self._parties:
+            loaded = await run_in_threadpool(self._load, [id_game])
+            if id_game not in loaded:
+                raise HTTPException(status_code=404, detail="Partie introuvable")
+            self._parties.update(loaded)
+        event = self._event(id_game, self._parties[id_game])
+        self._last.setdefault(id_game, event)
+        queue = asyncio.Queue(maxsize=CLOCK_QUEUE)
+        self._subscribers[id_game].add(queue)
+        queue.put_nowait(event)
+        return queue
+
+    def unsubscribe(self, id_game: int, queue):
+        subscribers = self._subscribers.get(id_game)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[id_game]
+            self._parties.pop(id_game, None)
+            self._last.pop(id_game, None)
+
+    # Ordonnanceur
+
+    @staticmethod
+    def _load(ids):
+        table = models.Partie.__table__
+        with database.engine.connect() as conn:
+            rows = conn.execute(
+                select(table.c.id_game, table.c.date_debut, table.c.duree, table.c.temps_restant)
+                .where(table.c.id_game.in_(ids))
+            )
+            return {row.id_game: (row.date_debut, row.duree, row.temps_restant) for row in rows}
+
+    @staticmethod
+    def _event(id_game, partie):
+        if partie is None:
+            return {"type": "deleted", "id_game": id_game, "temps_restant": None}
+        temps_restant = remaining(*partie)
+        return {"type": "expired" if temps_restant == 0 else "tick", "id_game": id_game,
+                "temps_restant": temps_restant}
+
+    def _push(self, id_game, event):
+        for queue in self._subscribers[id_game]:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Client en retard : les ticks suivants remplacent celui-ci
+                pass
+
+    def tick(self):
+        for id_game in list(self._subscribers):
+            event = self._event(id_game, self._parties.get(id_game))
+            previous = self._last.get(id_game)
+            self._last[id_game] = event
+            # Partie terminée ou sans horloge : un seul message tant que rien ne change
+            if event["type"] != "tick" and event == previous:
+                continue
+            if event["type"] == "tick" and previous and previous["temps_restant"] == event["temps_restant"]:
+                continue
+            self._push(id_game, event)
+
+    async def _resync(self):
+        ids = [id_game for id_game, partie in list(self._parties.items()) if partie is not None]
+        if not ids:
+            return
+        loaded = await run_in_threadpool(self._load, ids)
+        for id_game in ids:
+            if id_game in self._subscribers:
+                self._parties[id_game] = loaded.get(id_game)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_resync = loop.time() + CLOCK_RESYNC
+        while True:
+            await asyncio.sleep(CLOCK_TICK)
+            try:
+                if loop.time() >= next_resync:
+                    next_resync = loop.time() + CLOCK_RESYNC
+                    await self._resync()
+                self.tick()
+            except Exception:
+                logger.exception("Tick de l'horloge en échec")
+
+    def start(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._loop = None
+
+
+clock = Clock()
+
+
+# Routes
+
+@router.get("/parties/{id}/clock")
+async def stream_clock(id: int, request: Request):
+    """Temps restant de la partie en Server-Sent Events (tick, expired, deleted)"""
+    queue = await clock.subscribe(id)
+
+    async def events():
+        try:
+            while True:
+                event = await queue.get()
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                if event["type"] == "deleted":
+                    break
+        finally:
+            clock.unsubscribe(id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.websocket("/parties/{id}/clock/ws")
+async def websocket_clock(websocket: WebSocket, id: int):
+    """Même flux que /parties/{id}/clock, en WebSocket"""
+    try:
+        queue = await clock.subscribe(id)
+    except HTTPException:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    # Lecture en parallèle : détecte la déconnexion même quand aucun tick n'est envoyé
+    disconnected = asyncio.ensure_future(wait_disconnect(websocket))
+    try:
+        while True:
+            get = asyncio.ensure_future(queue.get())
+            await asyncio.wait({get, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                get.cancel()
+                break
+            event = get.result()
+            await websocket.send_json(event)
+            if event["type"] == "deleted":
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+        clock.unsubscribe(id, queue)
+
+
+async def wait_disconnect(websocket: WebSocket):
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
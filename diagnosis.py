@@ -0,0 +1,163 @@
+import logging
+import threading
+from collections import defaultdict
+from itertools import islice
+
+from fastapi import APIRouter, Query
+from sqlalchemy import select
+from typing import List
+
+from . import models, schemas, database, catalogue, fastjson
+from .answers import normalize
+
+logger = logging.getLogger(__name__)
+
+# Diagnostic : quelles maladies correspondent à ces symptômes, sans télécharger /maladies
+router = APIRouter(tags=["Diagnostic"])
+
+SYMPTOMES = ("symptome_1", "symptome_2", "symptome_3", "symptome_4", "symptome_5")
+
+
+def _symptomes(maladie):
+    return frozenset(normalize(maladie[name]) for name in SYMPTOMES if maladie[name]) - {""}
+
+
+def _mask(slots):
+    """Bitset des emplacements, construit en une passe (pas un nouvel entier par bit)"""
+    bitmap = bytearray(max(slots) // 8 + 1)
+    for slot in slots:
+        bitmap[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bitmap, "little")
+
+
+def _positions(bits):
+    """Emplacements des bits à 1, dans l'ordre croissant"""
+    for offset, byte in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, "little")):
+        while byte:
+            low = byte & -byte
+            yield (offset << 3) + low.bit_length() - 1
+            byte ^= low
+
+
+def _counters(masks):
+    """Compteur en tranches de bits : planes[i] = bit i du nombre de masques à 1, par emplacement"""
+    planes = []
+    for carry in masks:
+        for i, plane in enumerate(planes):
+            planes[i], carry = plane ^ carry, plane & carry
+            if not carry:
+                break
+        if carry:
+            planes.append(carry)
+    return planes
+
+
+class SymptomIndex:
+    """Index inversé : symptôme normalisé -> bitset (int) des emplacements des maladies.
+
+    Les emplacements suivent l'ordre des id_mal. Une écriture ne modifie que les bitsets des
+    symptômes de la maladie concernée ; une suppression laisse un emplacement vide."""
+
+    def __init__(self):
+        self._bitsets = {}
+        # emplacement -> maladie (None : supprimée), id_mal -> emplacement, id_mal -> symptômes normalisés
+        self._maladies = []
+        self._slots = {}
+        self._symptomes = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Aligne l'index sur la table : seules les maladies ajoutées, modifiées ou supprimées sont traitées"""
+        with database.engine.connect() as conn:
+            rows = [row._asdict() for row in conn.execute(
+                select(*fastjson.columns(models.Maladies, schemas.MaladieResponse)).order_by(models.Maladies.id_mal)
+            )]
+        present = {row["id_mal"] for row in rows}
+        with self._lock:
+            removed = [id_mal for id_mal in self._slots if id_mal not in present]
+            changed = [row for row in rows if self._stored(row["id_mal"]) != row]
+            last = max(self._slots, default=0)
+            holes = len(self._maladies) - len(self._slots) + len(removed)
+            # Nouvel id_mal avant le dernier emplacement, ou index à moitié vide : reconstruction
+            if any(row["id_mal"] not in self._slots and row["id_mal"] < last for row in changed) \
+                    or holes > len(present):
+                self._bitsets, self._maladies, self._slots, self._symptomes = {}, [], {}, {}
+                removed, changed = [], rows
+            self._apply(removed, changed)
+
+    def _stored(self, id_mal):
+        slot = self._slots.get(id_mal)
+        return None if slot is None else self._maladies[slot]
+
+    def _apply(self, removed, changed):
+        cleared, added = defaultdict(list), defaultdict(list)
+        for id_mal in removed:
+            slot = self._slots.pop(id_mal)
+            for symptome in self._symptomes.pop(id_mal):
+                cleared[symptome].append(slot)
+            self._maladies[slot] = None
+        for maladie in changed:
+            id_mal = maladie["id_mal"]
+            slot = self._slots.get(id_mal)
+            if slot is None:
+                slot = self._slots[id_mal] = len(self._maladies)
+                self._maladies.append(None)
+            old, new = self._symptomes.get(id_mal, frozenset()), _symptomes(maladie)
+            for symptome in old - new:
+                cleared[symptome].append(slot)
+            for symptome in new - old:
+                added[symptome].append(slot)
+            self._symptomes[id_mal] = new
+            self._maladies[slot] = maladie
+        for symptome, slots in cleared.items():
+            bits = self._bitsets[symptome] & ~_mask(slots)
+            if bits:
+                self._bitsets[symptome] = bits
+            else:
+                del self._bitsets[symptome]
+        for symptome, slots in added.items():
+            self._bitsets[symptome] = self._bitsets.get(symptome, 0) | _mask(slots)
+
+    def diagnose(self, symptomes, limit):
+        """Maladies triées par nombre de symptômes en commun, puis par id"""
+        results = []
+        with self._lock:
+            masks = [self._bitsets[symptome] for symptome in {normalize(symptome) for symptome in symptomes}
+                     if symptome in self._bitsets]
+            planes = _counters(masks)
+            matched = 0
+            for bits in masks:
+                matched |= bits
+            for count in range(len(masks), 0, -1):
+                tier = matched
+                for i, plane in enumerate(planes):
+                    tier &= plane if count >> i & 1 else ~plane
+                # Palier dans l'ordre des id_mal : seuls ses premiers emplacements sont parcourus
+                take = min(tier.bit_count(), limit - len(results))
+                for slot in islice(_positions(tier), take):
+                    results.append({"maladie": self._maladies[slot], "correspondances": count})
+                if len(results) >= limit:
+                    break
+        return results
+
+
+index = SymptomIndex()
+
+
+def _on_invalidation(table):
+    # Écriture sur les maladies (ou médicament supprimé en cascade), ici ou sur un autre worker.
+    # Le bus ne transmet que le nom de la table : relecture, puis mise à jour des seules maladies modifiées
+    if table == "maladies":
+        try:
+            index.load()
+        except Exception:
+            logger.exception("Mise à jour de l'index des symptômes impossible")
+
+
+catalogue.bus.subscribe(_on_invalidation)
+
+
+@router.get("/maladies/diagnose", response_model=List[schemas.Diagnostic])
+def diagnose(symptome: List[str] = Query(..., min_length=1), limit: int = Query(10, ge=1, le=100)):
+    """Maladies présentant au moins un des symptômes, les plus proches en premier"""
+    return index.diagnose(symptome, limit)
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import os
+import threading
+from collections import defaultdict
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+
+from . import models, schemas, database, catalogue, clock
+
+# Charger les variables d'environnement
+load_dotenv()
+
+# Événements d'une partie poussés aux tableaux de bord, à la place du polling de /parties et /reponses
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "partie_events")
+# Événements en attente par connexion : au-delà, le client trop lent est déconnecté
+EVENTS_QUEUE = int(os.getenv("EVENTS_QUEUE", 64))
+
+router = APIRouter(tags=["Événements"])
+
+# Même canal inter-workers que le catalogue : NOTIFY en Postgres, en mémoire sinon
+bus = (
+    catalogue.PostgresBus(database.engine, EVENTS_CHANNEL)
+    if catalogue.CATALOGUE_BUS == "postgres" else catalogue.LocalBus()
+)
+
+# Fin de flux pour un client qui ne suit plus
+_DROPPED = {"type": "dropped"}
+
+
+class _Connection:
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=EVENTS_QUEUE)
+
+    def offer(self, event):
+        if self.queue.full():
+            # Client trop lent : on vide sa file et on ferme, il rechargera /parties/{id}/state
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_DROPPED)
+            return
+        self.queue.put_nowait(event)
+
+
+# id_game -> connexions de ce worker
+_connections = defaultdict(set)
+_lock = threading.Lock()
+
+
+def _dispatch(payload):
+    event = json.loads(payload)
+    with _lock:
+        connections = list(_connections.get(event["id_game"], ()))
+    for connection in connections:
+        connection.loop.call_soon_threadsafe(connection.offer, event)
+
+
+bus.subscribe(_dispatch)
+
+
+# Publication (après commit, depuis les handlers d'écriture)
+
+def _payload(id_game, type, data):
+    return to_json({"type": type, "id_game": id_game, "data": data}).decode()
+
+
+def publish(id_game, type, data):
+    if id_game is None:
+        return
+    bus.publish(_payload(id_game, type, data))
+
+
+async def publish_async(db, id_game, type, data):
+    """Variante ASYNC_DB de publish : NOTIFY par l'AsyncSession de la requête"""
+    if id_game is None:
+        return
+    await bus.publish_async(db, _payload(id_game, type, data))
+
+
+def _partie(partie):
+    return schemas.PartieResponse.model_validate(partie, from_attributes=True).model_dump()
+
+
+def _reponse(reponse):
+    return schemas.ReponseResponse.model_validate(reponse, from_attributes=True).model_dump()
+
+
+def partie_changed(partie):
+    publish(partie.id_game, "partie", _partie(partie))
+
+
+def partie_deleted(id_game):
+    publish(id_game, "partie_supprimee", {"id_game": id_game})
+
+
+def reponse_created(id_game, reponse):
+    publish(id_game, "reponse", _reponse(reponse))
+
+
+async def partie_changed_async(db, partie):
+    await publish_async(db, partie.id_game, "partie", _partie(partie))
+
+
+async def partie_deleted_async(db, id_game):
+    await publish_async(db, id_game, "partie_supprimee", {"id_game": id_game})
+
+
+async def reponse_created_async(db, id_game, reponse):
+    await publish_async(db, id_game, "reponse", _reponse(reponse))
+
+
+def joueur_joined(joueur):
+    publish(joueur.id_game, "joueur", schemas.JoueurResponse.model_validate(joueur, from_attributes=True).model_dump())
+
+
+def id_game_of(db, id_joueur):
+    return db.execute(select(models.Joueurs.id_game).where(models.Joueurs.id_joueur == id_joueur)).scalar()
+
+
+# Abonnements
+
+def _partie_exists(id_game):
+    with database.engine.connect() as conn:
+        return conn.execute(
+            select(models.Partie.id_game).where(models.Partie.id_game == id_game)
+        ).first() is not None
+
+
+async def _subscribe(id_game):
+    if not await run_in_threadpool(_partie_exists, id_game):
+        raise HTTPException(status_code=404, detail="Partie introuvable")
+    connection = _Connection(asyncio.get_running_loop())
+    with _lock:
+        _connections[id_game].add(connection)
+    return connection
+
+
+def _unsubscribe(id_game, connection):
+    with _lock:
+        connections = _connections.get(id_game)
+        if connections is None:
+            return
+        connections.discard(connection)
+        if not connections:
+            del _connections[id_game]
+
+
+def _final(event):
+    return event is _DROPPED or event["type"] == "partie_supprimee"
+
+
+# Routes
+
+@router.get("/parties/{id}/events")
+async def stream_events(id: int):
+    """Événements de la partie en Server-Sent Events (partie, joueur, reponse, partie_supprimee)"""
+    connection = await _subscribe(id)
+
+    async def stream():
+        try:
+            while True:
+                event = await connection.queue.get()
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                if _final(event):
+                    break
+        finally:
+            _unsubscribe(id, connection)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.websocket("/parties/{id}/events/ws")
+async def websocket_events(websocket: WebSocket, id: int):
+    """Même flux que /parties/{id}/events, en WebSocket"""
+    try:
+        connection = await _subscribe(id)
+    except HTTPException:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    disconnected = asyncio.ensure_future(clock.wait_disconnect(websocket))
+    try:
+        while True:
+            get = asyncio.ensure_future(connection.queue.get())
+            await asyncio.wait({get, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                get.cancel()
+                break
+            event = get.result()
+            await websocket.send_json(event)
+            if _final(event):
+                # 1013 : réessayer plus tard (client trop lent)
+                await websocket.close(code=1013 if event is _DROPPED else 1000)
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+        _unsubscribe(id, connection)
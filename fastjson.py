@@ -0,0 +1,68 @@
+from fastapi import Response
+from pydantic_core import to_json
+from sqlalchemy import Float, Numeric, cast, select
+from typing import get_args
+from dotenv import load_dotenv
+import os
+
+from . import pagination, queries, clock
+
+# Charger les variables d'environnement
+load_dotenv()
+
+# Listes sérialisées directement depuis les lignes SQL, sans validation Pydantic par objet
+FAST_JSON = os.getenv("FAST_JSON", "false").lower() in ("1", "true", "yes")
+
+
+def _is_float(annotation):
+    return annotation is float or float in get_args(annotation)
+
+
+def columns(model, schema):
+    """Colonnes du schéma de réponse, typées comme la sortie Pydantic (DECIMAL -> float)"""
+    table = model.__table__
+    selected = []
+    for name, field in schema.model_fields.items():
+        column = table.c[name]
+        if isinstance(column.type, Numeric) and not isinstance(column.type, Float) and _is_float(field.annotation):
+            column = cast(column, Float).label(name)
+        selected.append(column)
+    return selected
+
+
+def select_for(model, schema, filters: dict):
+    return pagination.filter_by(select(*columns(model, schema)), model, filters)
+
+
+def _as_dict(row):
+    data = row._asdict()
+    # Champ calculé de PartieResponse
+    if "duree" in data:
+        clock.apply(data)
+    return data
+
+
+def dump_rows(rows):
+    """Lignes SQL -> JSON (bytes), encodeur natif de pydantic-core"""
+    return to_json([_as_dict(row) for row in rows])
+
+
+def dump_row(row):
+    return to_json(_as_dict(row))
+
+
+def fetch_page(db, model, schema, page: pagination.Page, filters: dict):
+    """(corps JSON, en-têtes) d'une page, par un select() des seules colonnes utiles"""
+    pk = queries.primary_key(model)
+    rows = db.execute(page.apply(select_for(model, schema, filters), pk)).all()
+    return dump_rows(rows), page.headers(rows, pk)
+
+
+async def fetch_page_async(db, model, schema, page: pagination.Page, filters: dict):
+    pk = queries.primary_key(model)
+    rows = (await db.execute(page.apply(select_for(model, schema, filters), pk))).all()
+    return dump_rows(rows), page.headers(rows, pk)
+
+
+def render(body, headers):
+    return Response(content=body, media_type="application/json", headers=headers)
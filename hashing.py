@@ -0,0 +1,100 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from dotenv import load_dotenv
+
+# Charger les variables d'environnement
+load_dotenv()
+
+# "thread" (bcrypt libère le GIL) ou "process" (pool de processus lancés par forkserver)
+HASH_EXECUTOR = os.getenv("HASH_EXECUTOR", "thread")
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 2))
+HASH_QUEUE_MAX = int(os.getenv("HASH_QUEUE_MAX", 64))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+_executor: Executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+# Fonctions exécutées dans les workers (doivent rester au niveau module)
+def _hash(password):
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _process_context():
+    # Jamais de fork du worker : il a déjà ses threads (threadpool, LISTEN, horloge) et leurs verrous
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if HASH_EXECUTOR == "thread":
+                _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+            else:
+                _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=_process_context())
+        return _executor
+
+
+def start():
+    """Crée l'exécuteur au démarrage plutôt qu'au premier login"""
+    get_executor()
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+async def _submit(fn, *args):
+    """Envoie un calcul bcrypt à l'exécuteur, en refusant au-delà de HASH_QUEUE_MAX"""
+    global _pending
+    with _pending_lock:
+        if _pending >= HASH_QUEUE_MAX:
+            raise HTTPException(status_code=503, detail="Service d'authentification saturé, réessayez")
+        _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), fn, *args)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+async def hash_password(password):
+    return await _submit(_hash, password)
+
+
+async def verify_password(plain_password, hashed_password):
+    return await _submit(_verify, plain_password, hashed_password)
+
+
+# Métriques
+def queue_depth():
+    return _pending
+
+
+def stats():
+    return {
+        "executor": HASH_EXECUTOR,
+        "workers": HASH_WORKERS,
+        "queue_depth": _pending,
+        "queue_max": HASH_QUEUE_MAX,
+    }
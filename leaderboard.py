@@ -0,0 +1,268 @@
+import logging
+import os
+import random
+import threading
+
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy import select
+from typing import List
+from dotenv import load_dotenv
+
+from . import models, schemas, database
+
+# Charger les variables d'environnement
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_MAX = int(os.getenv("LEADERBOARD_MAX", 100))
+# Relecture périodique de joueurs.score (secondes, 0 = jamais) : rattrape les écritures des autres workers
+LEADERBOARD_REFRESH = int(os.getenv("LEADERBOARD_REFRESH", 60))
+
+router = APIRouter(tags=["Classement"])
+
+
+class _Infinity:
+    """Borne de fin de la skip list : plus grande que toute clé"""
+
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+    def __ge__(self, other):
+        return True
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, next, width):
+        self.key = key
+        self.next = next
+        self.width = width
+
+
+_NIL = _Node(_Infinity(), [], [])
+
+
+class IndexableSkipList:
+    """Skip list dont chaque lien connaît sa largeur (nombre d'éléments sautés) :
+    insertion, suppression, rang et accès par position en O(log n)."""
+
+    MAX_LEVELS = 32
+
+    def __init__(self):
+        self.size = 0
+        self.head = _Node(None, [_NIL] * self.MAX_LEVELS, [1] * self.MAX_LEVELS)
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, key):
+        chain = [None] * self.MAX_LEVELS
+        steps_at_level = [0] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        height = 1
+        while height < self.MAX_LEVELS and random.random() < 0.5:
+            height += 1
+        new = _Node(key, [None] * height, [None] * height)
+        steps = 0
+        for level in range(height):
+            prev = chain[level]
+            new.next[level] = prev.next[level]
+            prev.next[level] = new
+            new.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(height, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain = [None] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+        target = chain[0].next[0]
+        if target is _NIL or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def count_less(self, key):
+        """Nombre de clés strictement inférieures à key"""
+        position = 0
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def first(self, n):
+        node = self.head.next[0]
+        keys = []
+        while node is not _NIL and len(keys) < n:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class Leaderboard:
+    """Classement par score décroissant ; ex æquo = même rang (1, 2, 2, 4)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = IndexableSkipList()
+        # id_joueur -> (score, username)
+        self._players = {}
+        # Écritures locales numérotées : id_joueur -> génération de sa dernière modification
+        self._generation = 0
+        self._changed = {}
+
+    @staticmethod
+    def _key(id_joueur, score):
+        return (-(score or 0), id_joueur)
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def _touch(self, id_joueur):
+        self._generation += 1
+        self._changed[id_joueur] = self._generation
+
+    def load(self, rows, since=None):
+        """Remplace le classement par rows. since : generation() lue avant le SELECT ; un joueur
+        modifié ici depuis garde son état en mémoire, que la lecture a pu manquer"""
+        index = IndexableSkipList()
+        players = {}
+        for id_joueur, username, score in rows:
+            index.insert(self._key(id_joueur, score))
+            players[id_joueur] = (score or 0, username)
+        with self._lock:
+            if since is not None:
+                for id_joueur, generation in self._changed.items():
+                    if generation <= since:
+                        continue
+                    loaded = players.pop(id_joueur, None)
+                    if loaded is not None:
+                        index.remove(self._key(id_joueur, loaded[0]))
+                    current = self._players.get(id_joueur)
+                    if current is not None:
+                        index.insert(self._key(id_joueur, current[0]))
+                        players[id_joueur] = current
+            self._changed = {id_joueur: generation for id_joueur, generation in self._changed.items()
+                             if since is not None and generation > since}
+            self._index, self._players = index, players
+
+    def update(self, id_joueur, username, score):
+        with self._lock:
+            self._touch(id_joueur)
+            current = self._players.get(id_joueur)
+            if current is not None:
+                self._index.remove(self._key(id_joueur, current[0]))
+            self._index.insert(self._key(id_joueur, score))
+            self._players[id_joueur] = (score or 0, username)
+
+    def add_points(self, id_joueur, delta):
+        with self._lock:
+            current = self._players.get(id_joueur)
+            if current is None:
+                return
+            self._touch(id_joueur)
+            score, username = current
+            self._index.remove(self._key(id_joueur, score))
+            self._index.insert(self._key(id_joueur, score + delta))
+            self._players[id_joueur] = (score + delta, username)
+
+    def remove(self, id_joueur):
+        with self._lock:
+            self._touch(id_joueur)
+            current = self._players.pop(id_joueur, None)
+            if current is not None:
+                self._index.remove(self._key(id_joueur, current[0]))
+
+    def _entry(self, id_joueur):
+        score, username = self._players[id_joueur]
+        # Rang = 1 + nombre de joueurs au score strictement supérieur
+        rang = self._index.count_less((-score, float("-inf"))) + 1
+        return {"rang": rang, "id_joueur": id_joueur, "username": username, "score": score}
+
+    def top(self, n):
+        with self._lock:
+            return [self._entry(id_joueur) for _, id_joueur in self._index.first(n)]
+
+    def rank(self, id_joueur):
+        with self._lock:
+            if id_joueur not in self._players:
+                return None
+            return self._entry(id_joueur)
+
+    def __len__(self):
+        return len(self._index)
+
+
+board = Leaderboard()
+_stop = threading.Event()
+
+
+def seed():
+    since = board.generation()
+    with database.engine.connect() as conn:
+        rows = conn.execute(select(models.Joueurs.id_joueur, models.Joueurs.username, models.Joueurs.score)).all()
+    board.load(rows, since)
+
+
+def _refresh_loop():
+    while not _stop.wait(LEADERBOARD_REFRESH):
+        try:
+            seed()
+        except Exception:
+            logger.exception("Rechargement du classement impossible")
+
+
+def start():
+    seed()
+    if LEADERBOARD_REFRESH > 0:
+        _stop.clear()
+        threading.Thread(target=_refresh_loop, name="leaderboard-refresh", daemon=True).start()
+
+
+def stop():
+    _stop.set()
+
+
+# Routes
+
+@router.get("/leaderboard", response_model=List[schemas.LeaderboardEntry])
+def get_leaderboard(top: int = Query(10, ge=1, le=LEADERBOARD_MAX)):
+    """Meilleurs joueurs, depuis l'index en mémoire"""
+    return board.top(top)
+
+
+@router.get("/joueurs/{id}/rank", response_model=schemas.LeaderboardEntry)
+def get_joueur_rank(id: int):
+    """Rang d'un joueur"""
+    entry = board.rank(id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Joueur introuvable")
+    return entry
@@ -1,17 +1,192 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List
+import logging
+import os
 
-from . import models, schemas, database, auth
+from dotenv import load_dotenv
 
-# Créer les tables dans la base de données
+from . import (
+    models, schemas, database, auth, hashing, async_routes, pagination, streaming, catalogue, bulk, queries,
+    migrations, relations, fastjson, leaderboard, clock, events, writebehind, answers, scoring, diagnosis,
+    search,
+)
+
+# Créer les tables dans la base de données, puis appliquer les migrations versionnées
 models.Base.metadata.create_all(bind=database.engine)
+migrations.upgrade(database.engine)
+
+logger = logging.getLogger(__name__)
+
+# Charger les variables d'environnement
+load_dotenv()
+
+# /internal/metrics (pools, caches, files d'attente) : 404 sauf si INTERNAL_METRICS=true
+INTERNAL_METRICS = os.getenv("INTERNAL_METRICS", "false").lower() in ("1", "true", "yes")
 
 app = FastAPI(title="Escape Game API", version="1.0")
 
 # Inclusion du router d'authentification (signup, login, me)
 app.include_router(auth.router)
 
+# Import en lot du contenu du jeu (/{entité}/bulk)
+app.include_router(bulk.router)
+
+# Ressources imbriquées (/salles/{id}/enigmes, /parties/{id}/joueurs, /parties/{id}/state)
+app.include_router(relations.router)
+
+# Classement des joueurs (/leaderboard, /joueurs/{id}/rank)
+app.include_router(leaderboard.router)
+
+# Horloge des parties (/parties/{id}/clock en SSE, /parties/{id}/clock/ws en WebSocket)
+app.include_router(clock.router)
+
+# Événements des parties (/parties/{id}/events en SSE, /parties/{id}/events/ws en WebSocket)
+app.include_router(events.router)
+
+# Diagnostic par symptômes (/maladies/diagnose), déclaré avant les routes CRUD de /maladies
+app.include_router(diagnosis.router)
+
+# Recherche par composant (/medicaments/search), déclarée avant les routes CRUD de /medicaments
+app.include_router(search.router)
+
+# Devenir des réponses en écriture différée (/reponses/{id}/statut)
+app.include_router(writebehind.router)
+
+# Routes CRUD synchrones (remplacées par async_routes si ASYNC_DB=true)
+router = APIRouter()
+
+
+# Contrainte violée, d'après le SQLSTATE (Postgres) ou le message (SQLite)
+_VIOLATIONS = (
+    ("foreign_key", "23503", "FOREIGN KEY constraint failed"),
+    ("unique", "23505", "UNIQUE constraint failed"),
+    ("not_null", "23502", "NOT NULL constraint failed"),
+)
+
+
+def _violation(exc: IntegrityError):
+    code = getattr(exc.orig, "pgcode", None) or getattr(exc.orig, "sqlstate", None)
+    message = str(exc.orig)
+    for kind, sqlstate, sqlite_message in _VIOLATIONS:
+        if code == sqlstate or sqlite_message in message:
+            return kind
+    return None
+
+
+@app.exception_handler(IntegrityError)
+def integrity_error_handler(request: Request, exc: IntegrityError):
+    kind = _violation(exc)
+    if kind == "foreign_key" and request.method == "DELETE":
+        # Suppression refusée par une clé étrangère en ON DELETE RESTRICT
+        return JSONResponse(status_code=409, content={"detail": "Opération refusée : éléments liés en base"})
+    if kind == "foreign_key":
+        # Création ou modification qui pointe vers une ligne inexistante (ex : id_medoc inconnu)
+        return JSONResponse(status_code=422, content={"detail": "Référence vers un élément inexistant"})
+    if kind == "unique":
+        return JSONResponse(status_code=409, content={"detail": "Valeur déjà utilisée par un autre élément"})
+    if kind == "not_null":
+        return JSONResponse(status_code=422, content={"detail": "Champ obligatoire manquant"})
+    return JSONResponse(status_code=409, content={"detail": "Opération refusée : contrainte d'intégrité"})
+
+
+@app.on_event("startup")
+def check_indexes():
+    for table, columns in migrations.missing_indexes(database.engine):
+        logger.warning("Index manquant : %s (%s)", table, ", ".join(columns))
+
+
+@app.on_event("startup")
+def check_foreign_keys():
+    for table, columns, current, expected in migrations.on_delete_mismatches(database.engine):
+        logger.warning(
+            "ON DELETE divergent : %s (%s) : %s en base, %s attendu", table, ", ".join(columns), current, expected
+        )
+
+
+@app.on_event("startup")
+def start_catalogue_bus():
+    catalogue.ensure_versions()
+    catalogue.bus.start()
+
+
+@app.on_event("startup")
+def start_leaderboard():
+    leaderboard.start()
+
+
+@app.on_event("shutdown")
+def stop_catalogue_bus():
+    catalogue.bus.stop()
+
+
+@app.on_event("shutdown")
+def stop_leaderboard():
+    leaderboard.stop()
+
+
+@app.on_event("startup")
+async def start_clock():
+    clock.clock.start()
+
+
+@app.on_event("startup")
+def start_events_bus():
+    events.bus.start()
+
+
+@app.on_event("shutdown")
+def stop_events_bus():
+    events.bus.stop()
+
+
+@app.on_event("startup")
+def load_answers():
+    answers.index.load()
+
+
+@app.on_event("startup")
+def load_symptoms():
+    diagnosis.index.load()
+
+
+@app.on_event("startup")
+def start_search():
+    search.start()
+
+
+@app.on_event("startup")
+def start_write_behind():
+    writebehind.start()
+
+
+@app.on_event("shutdown")
+def flush_write_behind():
+    writebehind.stop()
+
+
+@app.on_event("shutdown")
+async def stop_clock():
+    await clock.clock.stop()
+
+
+@app.on_event("startup")
+def start_hash_executor():
+    hashing.start()
+
+
+@app.on_event("shutdown")
+def shutdown_hash_executor():
+    hashing.shutdown()
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+
 
 
 # DÉPENDANCE BASE DE DONNÉES
@@ -25,51 +200,90 @@ def get_db():
 
 
 
+# MÉTRIQUES INTERNES
+
+@app.get("/internal/metrics", include_in_schema=False)
+def get_metrics():
+    if not INTERNAL_METRICS:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {
+        "hash": hashing.stats(),
+        "token_cache_size": len(auth.token_cache),
+        "write_behind": writebehind.stats(),
+        "db_pool": database.pool_stats(),
+        "db_pool_async": database.pool_stats(database.async_engine) if database.async_engine else None,
+    }
+
+
+
 # SALLES
 
-@app.get("/salles", response_model=List[schemas.SalleResponse])
-def get_salles(db: Session = Depends(get_db)):
-    return db.query(models.Salles).all()
+@router.get("/salles", response_model=List[schemas.SalleResponse])
+def get_salles(request: Request, page: pagination.Page = Depends(), db: Session = Depends(get_db)):
+    def load():
+        if fastjson.FAST_JSON:
+            return fastjson.fetch_page(db, models.Salles, schemas.SalleResponse, page, {})
+        items = page.apply(db.query(models.Salles), models.Salles.id_salle).all()
+        return catalogue.dump(List[schemas.SalleResponse], items), page.headers(items, models.Salles.id_salle)
 
+    return catalogue.read_through(request, "salles", page.key(), load)
 
-@app.get("/salles/{id}", response_model=schemas.SalleResponse)
-def get_salle(id: int, db: Session = Depends(get_db)):
-    salle = db.query(models.Salles).filter(models.Salles.id_salle == id).first()
-    if not salle:
-        raise HTTPException(status_code=404, detail="Salle introuvable")
-    return salle
+
+@router.get("/salles/{id}", response_model=schemas.SalleResponse)
+def get_salle(id: int, request: Request, db: Session = Depends(get_db)):
+    def load():
+        salle = db.query(models.Salles).filter(models.Salles.id_salle == id).first()
+        if not salle:
+            raise HTTPException(status_code=404, detail="Salle introuvable")
+        return catalogue.dump(schemas.SalleResponse, salle), {}
+
+    return catalogue.read_through(request, "salles", id, load)
 
 
-@app.post("/salles", response_model=schemas.SalleResponse)
+@router.post("/salles", response_model=schemas.SalleResponse)
 def create_salle(salle: schemas.SalleCreate, db: Session = Depends(get_db),
                  current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
     new_salle = models.Salles(**salle.dict())
     db.add(new_salle)
+    catalogue.bump(db, "salles")
     db.commit()
     db.refresh(new_salle)
     return new_salle
 
 
-@app.put("/salles/{id}", response_model=schemas.SalleResponse)
+@router.put("/salles/{id}", response_model=schemas.SalleResponse)
 def update_salle(id: int, updated: schemas.SalleCreate, db: Session = Depends(get_db),
                  current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    salle = db.query(models.Salles).filter(models.Salles.id_salle == id).first()
+    # Une seule requête : UPDATE ... RETURNING, 404 si aucune ligne touchée
+    salle = db.execute(queries.update_returning(models.Salles, id, updated.dict())).first()
     if not salle:
         raise HTTPException(status_code=404, detail="Salle non trouvée")
-    for k, v in updated.dict().items():
-        setattr(salle, k, v)
+    catalogue.bump(db, "salles")
     db.commit()
-    db.refresh(salle)
-    return salle
+    return salle._asdict()
 
 
-@app.delete("/salles/{id}")
+@router.patch("/salles/{id}", response_model=schemas.SalleResponse)
+def patch_salle(id: int, updated: schemas.SalleUpdate, db: Session = Depends(get_db),
+                current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
+    # Seules les colonnes envoyées sont écrites (UPDATE ciblé)
+    values = queries.patch_values(models.Salles, updated)
+    salle = db.execute(queries.update_returning(models.Salles, id, values)).first()
+    if not salle:
+        raise HTTPException(status_code=404, detail="Salle introuvable")
+    catalogue.bump(db, "salles")
+    db.commit()
+    return salle._asdict()
+
+
+@router.delete("/salles/{id}")
 def delete_salle(id: int, db: Session = Depends(get_db),
                  current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    salle = db.query(models.Salles).filter(models.Salles.id_salle == id).first()
-    if not salle:
+    # DELETE direct : les relations ne sont pas chargées, ON DELETE s'en charge en base
+    if not db.execute(queries.delete_returning(models.Salles, id)).first():
         raise HTTPException(status_code=404, detail="Salle introuvable")
-    db.delete(salle)
+    catalogue.bump(db, "salles")
+    catalogue.bump(db, "enigme")  # énigmes supprimées en cascade
     db.commit()
     return {"message": "Salle supprimée"}
 
@@ -77,41 +291,59 @@ def delete_salle(id: int, db: Session = Depends(get_db),
 
 # ENIGMES
 
-@app.get("/enigmes", response_model=List[schemas.EnigmeResponse])
-def get_enigmes(db: Session = Depends(get_db)):
-    return db.query(models.Enigme).all()
+@router.get("/enigmes", response_model=List[schemas.EnigmeResponse])
+def get_enigmes(request: Request, page: pagination.Page = Depends(),
+                filters: dict = Depends(pagination.enigme_filters), db: Session = Depends(get_db)):
+    def load():
+        if fastjson.FAST_JSON:
+            return fastjson.fetch_page(db, models.Enigme, schemas.EnigmeResponse, page, filters)
+        query = pagination.filter_by(db.query(models.Enigme), models.Enigme, filters)
+        items = page.apply(query, models.Enigme.id_enigme).all()
+        return catalogue.dump(List[schemas.EnigmeResponse], items), page.headers(items, models.Enigme.id_enigme)
 
+    return catalogue.read_through(request, "enigme", page.key() + tuple(filters.items()), load)
 
-@app.post("/enigmes", response_model=schemas.EnigmeResponse)
+
+@router.post("/enigmes", response_model=schemas.EnigmeResponse)
 def create_enigme(enigme: schemas.EnigmeCreate, db: Session = Depends(get_db),
                   current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
     new_enigme = models.Enigme(**enigme.dict())
     db.add(new_enigme)
+    catalogue.bump(db, "enigme")
     db.commit()
     db.refresh(new_enigme)
     return new_enigme
 
 
-@app.put("/enigmes/{id}", response_model=schemas.EnigmeResponse)
+@router.put("/enigmes/{id}", response_model=schemas.EnigmeResponse)
 def update_enigme(id: int, updated: schemas.EnigmeCreate, db: Session = Depends(get_db),
                   current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    enigme = db.query(models.Enigme).filter(models.Enigme.id_enigme == id).first()
+    enigme = db.execute(queries.update_returning(models.Enigme, id, updated.dict())).first()
     if not enigme:
         raise HTTPException(status_code=404, detail="Enigme non trouvée")
-    for k, v in updated.dict().items():
-        setattr(enigme, k, v)
+    catalogue.bump(db, "enigme")
     db.commit()
-    db.refresh(enigme)
-    return enigme
+    return enigme._asdict()
 
 
-@app.delete("/enigmes/{id}")
+@router.patch("/enigmes/{id}", response_model=schemas.EnigmeResponse)
+def patch_enigme(id: int, updated: schemas.EnigmeUpdate, db: Session = Depends(get_db),
+                 current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
+    values = queries.patch_values(models.Enigme, updated)
+    enigme = db.execute(queries.update_returning(models.Enigme, id, values)).first()
+    if not enigme:
+        raise HTTPException(status_code=404, detail="Enigme introuvable")
+    catalogue.bump(db, "enigme")
+    db.commit()
+    return enigme._asdict()
+
+
+@router.delete("/enigmes/{id}")
 def delete_enigme(id: int, db: Session = Depends(get_db),
                   current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    enigme = db.query(models.Enigme).filter(models.Enigme.id_enigme == id).first()
-    if not enigme:
+    if not db.execute(queries.delete_returning(models.Enigme, id)).first():
         raise HTTPException(status_code=404, detail="Enigme introuvable")
-    db.delete(enigme)
+    catalogue.bump(db, "enigme")
     db.commit()
     return {"message": "Enigme supprimée"}
 
@@ -119,41 +351,59 @@ def delete_enigme(id: int, db: Session = Depends(get_db),
 
 # MEDICAMENTS 
 
-@app.get("/medicaments", response_model=List[schemas.MedicamentResponse])
-def get_medicaments(db: Session = Depends(get_db)):
-    return db.query(models.Medicaments).all()
+@router.get("/medicaments", response_model=List[schemas.MedicamentResponse])
+def get_medicaments(request: Request, page: pagination.Page = Depends(), db: Session = Depends(get_db)):
+    def load():
+        if fastjson.FAST_JSON:
+            return fastjson.fetch_page(db, models.Medicaments, schemas.MedicamentResponse, page, {})
+        pk = models.Medicaments.id_medoc
+        items = page.apply(db.query(models.Medicaments), pk).all()
+        return catalogue.dump(List[schemas.MedicamentResponse], items), page.headers(items, pk)
+
+    return catalogue.read_through(request, "medicaments", page.key(), load)
 
 
-@app.post("/medicaments", response_model=schemas.MedicamentResponse)
+@router.post("/medicaments", response_model=schemas.MedicamentResponse)
 def create_medicament(medoc: schemas.MedicamentCreate, db: Session = Depends(get_db),
                       current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
     new_medoc = models.Medicaments(**medoc.dict())
     db.add(new_medoc)
+    catalogue.bump(db, "medicaments")
     db.commit()
     db.refresh(new_medoc)
     return new_medoc
 
 
-@app.put("/medicaments/{id}", response_model=schemas.MedicamentResponse)
+@router.put("/medicaments/{id}", response_model=schemas.MedicamentResponse)
 def update_medicament(id: int, updated: schemas.MedicamentCreate, db: Session = Depends(get_db),
                       current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    medoc = db.query(models.Medicaments).filter(models.Medicaments.id_medoc == id).first()
+    medoc = db.execute(queries.update_returning(models.Medicaments, id, updated.dict())).first()
+    if not medoc:
+        raise HTTPException(status_code=404, detail="Médicament introuvable")
+    catalogue.bump(db, "medicaments")
+    db.commit()
+    return medoc._asdict()
+
+
+@router.patch("/medicaments/{id}", response_model=schemas.MedicamentResponse)
+def patch_medicament(id: int, updated: schemas.MedicamentUpdate, db: Session = Depends(get_db),
+                     current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
+    values = queries.patch_values(models.Medicaments, updated)
+    medoc = db.execute(queries.update_returning(models.Medicaments, id, values)).first()
     if not medoc:
         raise HTTPException(status_code=404, detail="Médicament introuvable")
-    for k, v in updated.dict().items():
-        setattr(medoc, k, v)
+    catalogue.bump(db, "medicaments")
     db.commit()
-    db.refresh(medoc)
-    return medoc
+    return medoc._asdict()
 
 
-@app.delete("/medicaments/{id}")
+@router.delete("/medicaments/{id}")
 def delete_medicament(id: int, db: Session = Depends(get_db),
                       current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    medoc = db.query(models.Medicaments).filter(models.Medicaments.id_medoc == id).first()
-    if not medoc:
+    if not db.execute(queries.delete_returning(models.Medicaments, id)).first():
         raise HTTPException(status_code=404, detail="Médicament introuvable")
-    db.delete(medoc)
+    catalogue.bump(db, "medicaments")
+    catalogue.bump(db, "maladies")  # maladie liée supprimée en cascade
     db.commit()
     return {"message": "Médicament supprimé"}
 
@@ -161,41 +411,59 @@ def delete_medicament(id: int, db: Session = Depends(get_db),
 
 # MALADIES 
 
-@app.get("/maladies", response_model=List[schemas.MaladieResponse])
-def get_maladies(db: Session = Depends(get_db)):
-    return db.query(models.Maladies).all()
+@router.get("/maladies", response_model=List[schemas.MaladieResponse])
+def get_maladies(request: Request, page: pagination.Page = Depends(),
+                 filters: dict = Depends(pagination.maladie_filters), db: Session = Depends(get_db)):
+    def load():
+        if fastjson.FAST_JSON:
+            return fastjson.fetch_page(db, models.Maladies, schemas.MaladieResponse, page, filters)
+        query = pagination.filter_by(db.query(models.Maladies), models.Maladies, filters)
+        items = page.apply(query, models.Maladies.id_mal).all()
+        return catalogue.dump(List[schemas.MaladieResponse], items), page.headers(items, models.Maladies.id_mal)
+
+    return catalogue.read_through(request, "maladies", page.key() + tuple(filters.items()), load)
 
 
-@app.post("/maladies", response_model=schemas.MaladieResponse)
+@router.post("/maladies", response_model=schemas.MaladieResponse)
 def create_maladie(maladie: schemas.MaladieCreate, db: Session = Depends(get_db),
                    current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
     new_maladie = models.Maladies(**maladie.dict())
     db.add(new_maladie)
+    catalogue.bump(db, "maladies")
     db.commit()
     db.refresh(new_maladie)
     return new_maladie
 
 
-@app.put("/maladies/{id}", response_model=schemas.MaladieResponse)
+@router.put("/maladies/{id}", response_model=schemas.MaladieResponse)
 def update_maladie(id: int, updated: schemas.MaladieCreate, db: Session = Depends(get_db),
                    current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    maladie = db.query(models.Maladies).filter(models.Maladies.id_mal == id).first()
+    maladie = db.execute(queries.update_returning(models.Maladies, id, updated.dict())).first()
+    if not maladie:
+        raise HTTPException(status_code=404, detail="Maladie introuvable")
+    catalogue.bump(db, "maladies")
+    db.commit()
+    return maladie._asdict()
+
+
+@router.patch("/maladies/{id}", response_model=schemas.MaladieResponse)
+def patch_maladie(id: int, updated: schemas.MaladieUpdate, db: Session = Depends(get_db),
+                  current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
+    values = queries.patch_values(models.Maladies, updated)
+    maladie = db.execute(queries.update_returning(models.Maladies, id, values)).first()
     if not maladie:
         raise HTTPException(status_code=404, detail="Maladie introuvable")
-    for k, v in updated.dict().items():
-        setattr(maladie, k, v)
+    catalogue.bump(db, "maladies")
     db.commit()
-    db.refresh(maladie)
-    return maladie
+    return maladie._asdict()
 
 
-@app.delete("/maladies/{id}")
+@router.delete("/maladies/{id}")
 def delete_maladie(id: int, db: Session = Depends(get_db),
                    current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    maladie = db.query(models.Maladies).filter(models.Maladies.id_mal == id).first()
-    if not maladie:
+    if not db.execute(queries.delete_returning(models.Maladies, id)).first():
         raise HTTPException(status_code=404, detail="Maladie introuvable")
-    db.delete(maladie)
+    catalogue.bump(db, "maladies")
     db.commit()
     return {"message": "Maladie supprimée"}
 
@@ -203,54 +471,84 @@ def delete_maladie(id: int, db: Session = Depends(get_db),
 
 # PARTIE
 
-@app.get("/parties", response_model=List[schemas.PartieResponse])
-def get_parties(db: Session = Depends(get_db)):
-    return db.query(models.Partie).all()
+@router.get("/parties", response_model=List[schemas.PartieResponse])
+def get_parties(response: Response, page: pagination.Page = Depends(),
+                filters: dict = Depends(pagination.partie_filters), db: Session = Depends(get_db)):
+    # Sérialisation directe des lignes SQL, sans objets ORM ni validation Pydantic
+    if fastjson.FAST_JSON:
+        return fastjson.render(*fastjson.fetch_page(db, models.Partie, schemas.PartieResponse, page, filters))
+    query = pagination.filter_by(db.query(models.Partie), models.Partie, filters)
+    items = page.apply(query, models.Partie.id_game).all()
+    page.set_next(response, items, models.Partie.id_game)
+    return items
 
 
-@app.post("/parties", response_model=schemas.PartieResponse)
+@router.post("/parties", response_model=schemas.PartieResponse)
 def create_partie(partie: schemas.PartieCreate, db: Session = Depends(get_db),
                   current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
     new_partie = models.Partie(**partie.dict())
     db.add(new_partie)
     db.commit()
     db.refresh(new_partie)
+    clock.clock.changed(new_partie)
     return new_partie
 
 
-@app.put("/parties/{id}", response_model=schemas.PartieResponse)
+@router.put("/parties/{id}", response_model=schemas.PartieResponse)
 def update_partie(id: int, updated: schemas.PartieCreate, db: Session = Depends(get_db),
                   current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    partie = db.query(models.Partie).filter(models.Partie.id_game == id).first()
+    partie = db.execute(queries.update_returning(models.Partie, id, updated.dict())).first()
     if not partie:
         raise HTTPException(status_code=404, detail="Partie introuvable")
-    for k, v in updated.dict().items():
-        setattr(partie, k, v)
     db.commit()
-    db.refresh(partie)
-    return partie
+    clock.clock.changed(partie)
+    events.partie_changed(partie)
+    return partie._asdict()
 
 
-@app.delete("/parties/{id}")
+@router.patch("/parties/{id}", response_model=schemas.PartieResponse)
+def patch_partie(id: int, updated: schemas.PartieUpdate, db: Session = Depends(get_db),
+                 current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
+    values = queries.patch_values(models.Partie, updated)
+    partie = db.execute(queries.update_returning(models.Partie, id, values)).first()
+    if not partie:
+        raise HTTPException(status_code=404, detail="Partie introuvable")
+    db.commit()
+    clock.clock.changed(partie)
+    events.partie_changed(partie)
+    return partie._asdict()
+
+
+@router.delete("/parties/{id}")
 def delete_partie(id: int, db: Session = Depends(get_db),
                   current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    partie = db.query(models.Partie).filter(models.Partie.id_game == id).first()
-    if not partie:
+    if not db.execute(queries.delete_returning(models.Partie, id)).first():
         raise HTTPException(status_code=404, detail="Partie introuvable")
-    db.delete(partie)
     db.commit()
+    clock.clock.deleted(id)
+    events.partie_deleted(id)
     return {"message": "Partie supprimée"}
 
 
 
 # JOUEURS 
 
-@app.get("/joueurs", response_model=List[schemas.JoueurResponse])
-def get_joueurs(db: Session = Depends(get_db)):
-    return db.query(models.Joueurs).all()
-
-
-@app.get("/joueurs/{id}", response_model=schemas.JoueurResponse)
+@router.get("/joueurs", response_model=List[schemas.JoueurResponse])
+def get_joueurs(request: Request, response: Response, page: pagination.BoundedPage = Depends(),
+                filters: dict = Depends(pagination.joueur_filters), stream: bool = False,
+                db: Session = Depends(get_db)):
+    # Export complet en flux : ?stream=1 (tableau JSON) ou Accept: application/x-ndjson
+    if streaming.wants_stream(request, stream):
+        return streaming.export(request, models.Joueurs, models.Joueurs.id_joueur, filters, schemas.JoueurResponse)
+    if fastjson.FAST_JSON:
+        return fastjson.render(*fastjson.fetch_page(db, models.Joueurs, schemas.JoueurResponse, page, filters))
+    query = pagination.filter_by(db.query(models.Joueurs), models.Joueurs, filters)
+    items = page.apply(query, models.Joueurs.id_joueur).all()
+    page.set_next(response, items, models.Joueurs.id_joueur)
+    return items
+
+
+@router.get("/joueurs/{id}", response_model=schemas.JoueurResponse)
 def get_joueur(id: int, db: Session = Depends(get_db)):
     joueur = db.query(models.Joueurs).filter(models.Joueurs.id_joueur == id).first()
     if not joueur:
@@ -258,54 +556,79 @@ def get_joueur(id: int, db: Session = Depends(get_db)):
     return joueur
 
 
-@app.delete("/joueurs/{id}")
+@router.delete("/joueurs/{id}")
 def delete_joueur(id: int, db: Session = Depends(get_db),
                   current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    joueur = db.query(models.Joueurs).filter(models.Joueurs.id_joueur == id).first()
-    if not joueur:
+    if not db.execute(queries.delete_returning(models.Joueurs, id)).first():
         raise HTTPException(status_code=404, detail="Joueur introuvable")
-    db.delete(joueur)
     db.commit()
+    auth.invalidate_user(id)
+    leaderboard.board.remove(id)
     return {"message": "Joueur supprimé"}
 
 
 
 # REPONSES
 
-@app.get("/reponses", response_model=List[schemas.ReponseResponse])
-def get_reponses(db: Session = Depends(get_db)):
-    return db.query(models.Responses).all()
-
-
-@app.post("/reponses", response_model=schemas.ReponseResponse)
+@router.get("/reponses", response_model=List[schemas.ReponseResponse])
+def get_reponses(request: Request, response: Response, page: pagination.BoundedPage = Depends(),
+                 filters: dict = Depends(pagination.reponse_filters), stream: bool = False,
+                 db: Session = Depends(get_db)):
+    # Export complet en flux : ?stream=1 (tableau JSON) ou Accept: application/x-ndjson
+    if streaming.wants_stream(request, stream):
+        return streaming.export(request, models.Responses, models.Responses.id_resp, filters, schemas.ReponseResponse)
+    if fastjson.FAST_JSON:
+        return fastjson.render(*fastjson.fetch_page(db, models.Responses, schemas.ReponseResponse, page, filters))
+    query = pagination.filter_by(db.query(models.Responses), models.Responses, filters)
+    items = page.apply(query, models.Responses.id_resp).all()
+    page.set_next(response, items, models.Responses.id_resp)
+    return items
+
+
+@router.post("/reponses", response_model=schemas.ReponseResponse)
 def create_reponse(resp: schemas.ReponseCreate, db: Session = Depends(get_db),
                    current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    new_resp = models.Responses(**resp.dict())
-    db.add(new_resp)
-    db.commit()
-    db.refresh(new_resp)
-    return new_resp
+    # WRITE_BEHIND : mise en file, insertion par lots en arrière-plan
+    if writebehind.WRITE_BEHIND:
+        return writebehind.submit(resp)
+    # Score du joueur mis à jour dans la même transaction que l'INSERT
+    new_resp = scoring.insert_responses(db, [answers.with_correcte(resp.dict())])[0]
+    events.reponse_created(events.id_game_of(db, new_resp.id_joueur), new_resp)
+    return new_resp._asdict()
 
 
-@app.put("/reponses/{id}", response_model=schemas.ReponseResponse)
+@router.put("/reponses/{id}", response_model=schemas.ReponseResponse)
 def update_reponse(id: int, updated: schemas.ReponseCreate, db: Session = Depends(get_db),
                    current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    resp = db.query(models.Responses).filter(models.Responses.id_resp == id).first()
+    # correcte, id_enigme et bonus recalculés, ancien gain retiré du score
+    resp = scoring.update_response(db, id, updated.dict())
     if not resp:
         raise HTTPException(status_code=404, detail="Réponse introuvable")
-    for k, v in updated.dict().items():
-        setattr(resp, k, v)
-    db.commit()
-    db.refresh(resp)
-    return resp
+    return resp._asdict()
+
+
+@router.patch("/reponses/{id}", response_model=schemas.ReponseResponse)
+def patch_reponse(id: int, updated: schemas.ReponseUpdate, db: Session = Depends(get_db),
+                  current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
+    values = queries.patch_values(models.Responses, updated)
+    # Champs non envoyés : valeurs actuelles, pour recalculer correcte et le gain
+    resp = scoring.update_response(db, id, values)
+    if not resp:
+        raise HTTPException(status_code=404, detail="Réponse introuvable")
+    return resp._asdict()
 
 
-@app.delete("/reponses/{id}")
+@router.delete("/reponses/{id}")
 def delete_reponse(id: int, db: Session = Depends(get_db),
                    current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
-    resp = db.query(models.Responses).filter(models.Responses.id_resp == id).first()
-    if not resp:
+    if not scoring.delete_response(db, id):
         raise HTTPException(status_code=404, detail="Réponse introuvable")
-    db.delete(resp)
-    db.commit()
     return {"message": "Réponse supprimée"}
+
+
+
+# Sélection du chemin CRUD : AsyncSession (ASYNC_DB=true) ou Session synchrone
+if database.ASYNC_DB:
+    app.include_router(async_routes.router)
+else:
+    app.include_router(router)
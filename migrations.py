@@ -0,0 +1,235 @@
+import logging
+
+from sqlalchemy import MetaData, inspect, insert, select, text
+from sqlalchemy.schema import CreateTable
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Verrou consultatif Postgres : un seul worker applique les migrations
+_LOCK_KEY = 734201
+
+
+# Migrations versionnées, appliquées dans l'ordre et une seule fois (table schema_migrations).
+# create_all ne crée que les tables absentes : tout changement sur une table existante passe ici.
+
+def _duplicate_usernames(conn):
+    return conn.execute(text(
+        "SELECT username, COUNT(*) FROM joueurs GROUP BY username HAVING COUNT(*) > 1 ORDER BY username"
+    )).all()
+
+
+def _m1_indexes(conn):
+    """Index des clés étrangères et de joueurs.username (unique)"""
+    duplicates = _duplicate_usernames(conn)
+    if duplicates:
+        # Sans ce contrôle, CREATE UNIQUE INDEX échoue avec une erreur SQL peu parlante
+        shown = ", ".join(f"{username!r} ({count})" for username, count in duplicates[:20])
+        more = f" et {len(duplicates) - 20} autres" if len(duplicates) > 20 else ""
+        raise RuntimeError(
+            f"Migration 1 impossible : {len(duplicates)} noms d'utilisateur en double dans joueurs : "
+            f"{shown}{more}. Renommez ou fusionnez ces comptes puis relancez l'application."
+        )
+    statements = [
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_joueurs_username ON joueurs (username)",
+        "CREATE INDEX IF NOT EXISTS ix_joueurs_id_game ON joueurs (id_game)",
+        "CREATE INDEX IF NOT EXISTS ix_enigme_id_salle ON enigme (id_salle)",
+        "CREATE INDEX IF NOT EXISTS ix_responses_id_salle ON responses (id_salle)",
+        "CREATE INDEX IF NOT EXISTS ix_responses_id_joueur ON responses (id_joueur)",
+    ]
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def _on_delete(value):
+    return (value or "NO ACTION").upper()
+
+
+def _on_delete_drift(inspector):
+    """Clés étrangères dont le ON DELETE en base diffère de models.py : [(table, fk du modèle, fk reflétée)]"""
+    drift = []
+    for table in models.Base.metadata.sorted_tables:
+        existing = {tuple(fk["constrained_columns"]): fk for fk in inspector.get_foreign_keys(table.name)}
+        for fk in table.foreign_key_constraints:
+            current = existing.get(tuple(fk.column_keys))
+            if current is not None and _on_delete(current["options"].get("ondelete")) != _on_delete(fk.ondelete):
+                drift.append((table, fk, current))
+    return drift
+
+
+def _m2_foreign_keys_on_delete(conn):
+    """Aligne les ON DELETE des clés étrangères sur models.py (Postgres ; SQLite : rebuild_sqlite_foreign_keys)"""
+    if conn.dialect.name != "postgresql":
+        # SQLite ne sait pas modifier une contrainte sans reconstruire la table
+        return
+    for table, fk, current in _on_delete_drift(inspect(conn)):
+        columns = tuple(fk.column_keys)
+        referred = fk.elements[0].column
+        conn.execute(text(
+            f'ALTER TABLE {table.name} DROP CONSTRAINT "{current["name"]}", '
+            f'ADD CONSTRAINT "{current["name"]}" FOREIGN KEY ({", ".join(columns)}) '
+            f"REFERENCES {referred.table.name} ({referred.name}) ON DELETE {fk.ondelete or 'NO ACTION'}"
+        ))
+
+
+def _add_column(conn, table, column, ddl):
+    if column not in {existing["name"] for existing in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _m3_partie_duree(conn):
+    """partie.duree : durée de la partie, pour l'horloge côté serveur"""
+    _add_column(conn, "partie", "duree", "INTEGER")
+
+
+def _m4_enigme_solution(conn):
+    """enigme.solution : réponses attendues, pour la vérification côté serveur"""
+    _add_column(conn, "enigme", "solution", "VARCHAR(250)")
+
+
+def _m5_scoring(conn):
+    """enigme.points, responses.id_enigme / points / bonus et unicité (joueur, énigme) pour le score"""
+    _add_column(conn, "enigme", "points", "INTEGER")
+    _add_column(conn, "responses", "id_enigme", "INTEGER REFERENCES enigme (id_enigme) ON DELETE SET NULL")
+    _add_column(conn, "responses", "points", "INTEGER")
+    _add_column(conn, "responses", "bonus", "INTEGER")
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_responses_id_joueur_id_enigme ON responses (id_joueur, id_enigme)"
+    ))
+
+
+def _m6_composants_trgm(conn):
+    """Index trigrammes (pg_trgm) des composants pour /medicaments/search (Postgres uniquement)"""
+    if conn.dialect.name != "postgresql":
+        # Index de trigrammes en mémoire (search.py)
+        return
+    try:
+        # Point de sauvegarde : sans droit CREATE EXTENSION, la transaction des migrations continue
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as exc:
+        logger.warning("Extension pg_trgm indisponible (%s), recherche des composants en mémoire", type(exc).__name__)
+        return
+    for column in ("composition_1", "composition_2", "composition_3"):
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_medicaments_{column}_trgm "
+            f"ON medicaments USING gin (lower({column}) gin_trgm_ops)"
+        ))
+
+
+MIGRATIONS = [
+    (1, "Index sur les clés étrangères et joueurs.username", _m1_indexes),
+    (2, "ON DELETE des clés étrangères", _m2_foreign_keys_on_delete),
+    (3, "Colonne partie.duree", _m3_partie_duree),
+    (4, "Colonne enigme.solution", _m4_enigme_solution),
+    (5, "Colonnes du score incrémental", _m5_scoring),
+    (6, "Index trigrammes des composants", _m6_composants_trgm),
+]
+
+
+def upgrade(engine):
+    """Applique les migrations manquantes dans une seule transaction"""
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+        applied = set(conn.execute(select(models.SchemaMigration.version)).scalars())
+        for version, description, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            logger.info("Migration %s : %s", version, description)
+            migrate(conn)
+            conn.execute(insert(models.SchemaMigration).values(version=version, description=description))
+    rebuild_sqlite_foreign_keys(engine)
+
+
+def _rebuild_sqlite_table(cursor, dialect, metadata, table):
+    name = table.name
+    columns = [row[1] for row in cursor.execute(f'PRAGMA table_info("{name}")')]
+    unknown = set(columns) - set(table.columns.keys())
+    if unknown:
+        # Recopier la table perdrait ces colonnes : la base reste telle quelle
+        logger.warning(
+            "Table %s non reconstruite : colonnes absentes de models.py (%s)", name, ", ".join(sorted(unknown))
+        )
+        return
+    indexes = [sql for (sql,) in cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (name,)
+    )]
+    rebuilt = table.to_metadata(metadata, name=f"{name}__rebuild")
+    cursor.execute(str(CreateTable(rebuilt).compile(dialect=dialect)))
+    listed = ", ".join(f'"{column}"' for column in columns)
+    cursor.execute(f'INSERT INTO "{rebuilt.name}" ({listed}) SELECT {listed} FROM "{name}"')
+    cursor.execute(f'DROP TABLE "{name}"')
+    cursor.execute(f'ALTER TABLE "{rebuilt.name}" RENAME TO "{name}"')
+    for sql in indexes:
+        cursor.execute(sql)
+
+
+def rebuild_sqlite_foreign_keys(engine):
+    """SQLite : reconstruit les tables dont les ON DELETE diffèrent de models.py
+
+    SQLite ne modifie pas une contrainte en place. Procédure de sa documentation (ALTER TABLE) :
+    clés étrangères désactivées, nouvelle table, copie, suppression, renommage, index recréés,
+    le tout dans une transaction. Sans elle, une base créée avant les ON DELETE garde ses 409.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    tables = {table.name: table for table, _, _ in _on_delete_drift(inspect(engine))}
+    if not tables:
+        return
+    # Cibles des REFERENCES : les tables du modèle, dans une copie des métadonnées
+    metadata = MetaData()
+    for table in models.Base.metadata.sorted_tables:
+        table.to_metadata(metadata)
+    raw = engine.raw_connection()
+    try:
+        sqlite = raw.driver_connection
+        isolation_level = sqlite.isolation_level
+        # BEGIN / COMMIT explicites : pysqlite n'ouvrirait pas de transaction pour le DDL
+        sqlite.isolation_level = None
+        cursor = sqlite.cursor()
+        # Sans effet dans une transaction : avant BEGIN
+        cursor.execute("PRAGMA foreign_keys=OFF")
+        try:
+            cursor.execute("BEGIN")
+            for table in tables.values():
+                logger.info("Reconstruction de la table %s (ON DELETE)", table.name)
+                _rebuild_sqlite_table(cursor, engine.dialect, metadata, table)
+            violations = cursor.execute("PRAGMA foreign_key_check").fetchall()
+            if violations:
+                # Lignes déjà orphelines avant la reconstruction : signalées, pas corrigées
+                logger.warning("Clés étrangères orphelines après reconstruction : %s", violations[:20])
+            cursor.execute("COMMIT")
+        except Exception:
+            if sqlite.in_transaction:
+                cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.execute("PRAGMA foreign_keys=ON")
+            sqlite.isolation_level = isolation_level
+    finally:
+        raw.close()
+
+
+def on_delete_mismatches(engine):
+    """ON DELETE en base différents de models.py : [(table, colonnes, en base, attendu)]"""
+    return [
+        (table.name, tuple(fk.column_keys), _on_delete(current["options"].get("ondelete")), _on_delete(fk.ondelete))
+        for table, fk, current in _on_delete_drift(inspect(engine))
+    ]
+
+
+def missing_indexes(engine):
+    """Index déclarés dans models.py mais absents de la base : [(table, colonnes)]"""
+    inspector = inspect(engine)
+    missing = []
+    for table in models.Base.metadata.sorted_tables:
+        present = {tuple(ix["column_names"]) for ix in inspector.get_indexes(table.name)}
+        present |= {tuple(uc["column_names"]) for uc in inspector.get_unique_constraints(table.name)}
+        present.add(tuple(inspector.get_pk_constraint(table.name)["constrained_columns"]))
+        for index in table.indexes:
+            columns = tuple(column.name for column in index.columns)
+            if columns not in present:
+                missing.append((table.name, columns))
+    return missing
@@ -1,7 +1,15 @@
-from sqlalchemy import Column, Integer, String, Date, DECIMAL, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Date, DECIMAL, Boolean, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
+from dotenv import load_dotenv
+import os
+
 from .database import Base
 
+load_dotenv()
+
+# Clés étrangères obligatoires : "CASCADE" (suppression des lignes liées en base) ou "RESTRICT"
+FK_ON_DELETE = os.getenv("FK_ON_DELETE", "CASCADE").upper()
+
 class Salles(Base):
     __tablename__ = "salles"
 
@@ -9,8 +17,8 @@ class Salles(Base):
     name = Column(String(50), nullable=True)
     description = Column(String(250), nullable=True)
     ordre = Column(Integer, nullable=True)
-    enigmes = relationship("Enigme", back_populates="salle")
-    responses = relationship("Responses", back_populates="salle")
+    enigmes = relationship("Enigme", back_populates="salle", passive_deletes=True)
+    responses = relationship("Responses", back_populates="salle", passive_deletes=True)
 
 
 class Enigme(Base):
@@ -21,7 +29,11 @@ class Enigme(Base):
     description = Column(String(250), nullable=True)
     type_enigme = Column(String(50), nullable=True)
     indice = Column(String(50), nullable=True)
-    id_salle = Column(Integer, ForeignKey("salles.id_salle"), nullable=False)
+    # Réponse(s) attendue(s), variantes séparées par "|" : lue par answers.py, jamais renvoyée par l'API
+    solution = Column(String(250), nullable=True)
+    # Points gagnés en la résolvant (SCORE_POINTS si vide)
+    points = Column(Integer, nullable=True)
+    id_salle = Column(Integer, ForeignKey("salles.id_salle", ondelete=FK_ON_DELETE), nullable=False, index=True)
     salle = relationship("Salles", back_populates="enigmes") 
 
 
@@ -34,7 +46,7 @@ class Medicaments(Base):
     composition_1 = Column(String(50), nullable=True)
     composition_2 = Column(String(50), nullable=True)
     composition_3 = Column(String(50), nullable=True)
-    maladie = relationship("Maladies", back_populates="medicament", uselist=False)
+    maladie = relationship("Maladies", back_populates="medicament", uselist=False, passive_deletes=True)
 
 
 class Maladies(Base):
@@ -49,7 +61,7 @@ class Maladies(Base):
     symptome_5 = Column(String(50), nullable=True)
     frequence_medoc = Column(Integer, nullable=True)
 
-    id_medoc = Column(Integer, ForeignKey("medicaments.id_medoc"), nullable=False, unique=True)
+    id_medoc = Column(Integer, ForeignKey("medicaments.id_medoc", ondelete=FK_ON_DELETE), nullable=False, unique=True)
     medicament = relationship("Medicaments", back_populates="maladie")
 
 
@@ -62,21 +74,31 @@ class Partie(Base):
     date_debut = Column(DateTime, nullable=True)
     date_fin = Column(DateTime, nullable=True)
     temps_restant = Column(Integer, nullable=True)
+    # Durée totale (secondes) : temps_restant est alors calculé depuis date_debut (voir clock.py)
+    duree = Column(Integer, nullable=True)
     temperature = Column(DECIMAL(15, 2), nullable=True)
-    joueurs = relationship("Joueurs", back_populates="partie")
+    joueurs = relationship("Joueurs", back_populates="partie", passive_deletes=True)
 
 
 class Joueurs(Base):
     __tablename__ = "joueurs"
 
     id_joueur = Column(Integer, primary_key=True, index=True)
-    username = Column(String(50), nullable=False)
+    username = Column(String(50), nullable=False, unique=True, index=True)
     email = Column(String(50), nullable=True)
     password = Column(String(250), nullable=False)
     score = Column(Integer, nullable=True)
-    id_game = Column(Integer, ForeignKey("partie.id_game"), nullable=True)
+    # Supprimer une partie libère ses joueurs
+    id_game = Column(Integer, ForeignKey("partie.id_game", ondelete="SET NULL"), nullable=True, index=True)
     partie = relationship("Partie", back_populates="joueurs")
-    responses = relationship("Responses", back_populates="joueur")
+    responses = relationship("Responses", back_populates="joueur", passive_deletes=True)
+
+
+class TokenVersion(Base):
+    __tablename__ = "token_versions"
+
+    id_joueur = Column(Integer, ForeignKey("joueurs.id_joueur", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
 
 
 class Responses(Base):
@@ -87,8 +109,31 @@ class Responses(Base):
     date_reponse = Column(Date, nullable=True)
     correcte = Column(Boolean, nullable=True)
 
-    id_salle = Column(Integer, ForeignKey("salles.id_salle"), nullable=False)
-    id_joueur = Column(Integer, ForeignKey("joueurs.id_joueur"), nullable=False)
+    id_salle = Column(Integer, ForeignKey("salles.id_salle", ondelete=FK_ON_DELETE), nullable=False, index=True)
+    id_joueur = Column(Integer, ForeignKey("joueurs.id_joueur", ondelete=FK_ON_DELETE), nullable=False, index=True)
+    # Renseignés sur la première réponse correcte d'un joueur à une énigme : base du score (voir scoring.py).
+    # points : ceux de l'énigme au moment du gain, conservés si elle change ou disparaît
+    id_enigme = Column(Integer, ForeignKey("enigme.id_enigme", ondelete="SET NULL"), nullable=True)
+    points = Column(Integer, nullable=True)
+    bonus = Column(Integer, nullable=True)
 
     salle = relationship("Salles", back_populates="responses") 
     joueur = relationship("Joueurs", back_populates="responses")
+
+    # Une énigme ne rapporte des points qu'une fois par joueur (NULL multiples autorisés)
+    __table_args__ = (Index("ux_responses_id_joueur_id_enigme", "id_joueur", "id_enigme", unique=True),)
+
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    table_name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    description = Column(String(250), nullable=False)
+    applied_at = Column(DateTime, nullable=False, server_default=func.now())
@@ -0,0 +1,91 @@
+from fastapi import Query, Response
+from typing import Optional
+from dotenv import load_dotenv
+import os
+
+# Charger les variables d'environnement
+load_dotenv()
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", 100))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", 1000))
+
+
+class Page:
+    """Pagination par clé (keyset) sur la clé primaire : ?limit=...&after=<dernier id reçu>
+
+    L'id à passer pour la page suivante est renvoyé dans l'en-tête X-Next-After.
+    Sans limit ni after, la liste est renvoyée entière comme avant la pagination ;
+    avec after seul, la page fait PAGE_SIZE éléments.
+    """
+
+    # Sans limit, pages de PAGE_SIZE même à la première requête (voir BoundedPage)
+    bounded = False
+
+    def __init__(self, limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+                 after: Optional[int] = Query(None, description="Dernier id de la page précédente")):
+        if limit is None and (after is not None or self.bounded):
+            limit = PAGE_SIZE
+        self.limit = limit
+        self.after = after
+
+    def apply(self, stmt, pk):
+        """Restreint une Query ou un select() à la page demandée"""
+        if self.after is not None:
+            stmt = stmt.where(pk > self.after)
+        stmt = stmt.order_by(pk)
+        return stmt if self.limit is None else stmt.limit(self.limit)
+
+    def headers(self, items, pk):
+        """En-tête X-Next-After quand la page est pleine"""
+        if self.limit is not None and len(items) == self.limit:
+            return {"X-Next-After": str(getattr(items[-1], pk.key))}
+        return {}
+
+    def set_next(self, response: Response, items, pk):
+        response.headers.update(self.headers(items, pk))
+
+    def key(self):
+        return (self.limit, self.after)
+
+
+class BoundedPage(Page):
+    """Pagination des tables qui grossissent sans fin (/joueurs, /reponses) : PAGE_SIZE par défaut
+
+    L'export complet passe par le flux NDJSON / tableau JSON (streaming.py), pas par la liste.
+    """
+
+    bounded = True
+
+
+def filter_by(stmt, model, filters: dict):
+    """Filtres d'égalité, ignorés quand la valeur n'est pas fournie"""
+    for column, value in filters.items():
+        if value is not None:
+            stmt = stmt.where(getattr(model, column) == value)
+    return stmt
+
+
+# Filtres disponibles par entité
+def no_filters():
+    return {}
+
+
+def enigme_filters(id_salle: Optional[int] = None, type_enigme: Optional[str] = None):
+    return {"id_salle": id_salle, "type_enigme": type_enigme}
+
+
+def maladie_filters(id_medoc: Optional[int] = None):
+    return {"id_medoc": id_medoc}
+
+
+def partie_filters(etat_sante: Optional[str] = None):
+    return {"etat_sante": etat_sante}
+
+
+def joueur_filters(id_game: Optional[int] = None, username: Optional[str] = None):
+    return {"id_game": id_game, "username": username}
+
+
+def reponse_filters(id_salle: Optional[int] = None, id_joueur: Optional[int] = None,
+                    correcte: Optional[bool] = None):
+    return {"id_salle": id_salle, "id_joueur": id_joueur, "correcte": correcte}
@@ -0,0 +1,32 @@
+from fastapi import HTTPException
+from sqlalchemy import delete, update
+
+
+# Écritures en une seule requête (partagées par main.py et async_routes.py)
+
+def primary_key(model):
+    return model.__table__.primary_key.columns.values()[0]
+
+
+def update_returning(model, id, values: dict):
+    """UPDATE ... WHERE pk = :id RETURNING * : aucune ligne renvoyée si l'id n'existe pas"""
+    table = model.__table__
+    return update(table).where(primary_key(model) == id).values(**values).returning(*table.c)
+
+
+def delete_returning(model, id):
+    """DELETE ... WHERE pk = :id RETURNING pk : les lignes liées sont gérées par ON DELETE en base"""
+    pk = primary_key(model)
+    return delete(model.__table__).where(pk == id).returning(pk)
+
+
+def patch_values(model, patch):
+    """Champs réellement envoyés (exclude_unset) ; refuse null sur une colonne NOT NULL"""
+    values = patch.dict(exclude_unset=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="Aucun champ à modifier")
+    columns = model.__table__.c
+    invalid = [k for k, v in values.items() if v is None and not columns[k].nullable]
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"Champs obligatoires : {', '.join(invalid)}")
+    return values
@@ -0,0 +1,120 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session, selectinload
+from typing import List
+
+from . import models, schemas, database, catalogue, auth, events, queries
+
+# Ressources imbriquées : une salle avec ses énigmes, une partie avec ses joueurs et son état.
+# selectinload : l'entité parente puis ses enfants en une requête IN sur la clé étrangère indexée.
+router = APIRouter(tags=["Relations"])
+
+
+# DÉPENDANCE BASE DE DONNÉES
+
+def get_db():
+    db = database.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.get("/salles/{id}/enigmes", response_model=List[schemas.EnigmeResponse])
+def get_salle_enigmes(id: int, request: Request, db: Session = Depends(get_db)):
+    """Énigmes d'une salle"""
+    def load():
+        salle = (
+            db.query(models.Salles)
+            .options(selectinload(models.Salles.enigmes))
+            .filter(models.Salles.id_salle == id)
+            .first()
+        )
+        if not salle:
+            raise HTTPException(status_code=404, detail="Salle introuvable")
+        enigmes = sorted(salle.enigmes, key=lambda enigme: enigme.id_enigme)
+        return catalogue.dump(List[schemas.EnigmeResponse], enigmes), {}
+
+    # Mis en cache avec les énigmes : supprimer la salle supprime aussi ses énigmes
+    return catalogue.read_through(request, "enigme", ("salle", id), load)
+
+
+@router.get("/parties/{id}/joueurs", response_model=List[schemas.JoueurResponse])
+def get_partie_joueurs(id: int, db: Session = Depends(get_db)):
+    """Joueurs d'une partie"""
+    partie = (
+        db.query(models.Partie)
+        .options(selectinload(models.Partie.joueurs))
+        .filter(models.Partie.id_game == id)
+        .first()
+    )
+    if not partie:
+        raise HTTPException(status_code=404, detail="Partie introuvable")
+    return sorted(partie.joueurs, key=lambda joueur: joueur.id_joueur)
+
+
+@router.post("/parties/{id}/joueurs", response_model=schemas.JoueurResponse)
+def join_partie(id: int, db: Session = Depends(get_db),
+                current_user: schemas.JoueurResponse = Depends(auth.get_current_user)):
+    """Le joueur connecté rejoint la partie"""
+    if db.get(models.Partie, id) is None:
+        raise HTTPException(status_code=404, detail="Partie introuvable")
+    joueur = db.execute(queries.update_returning(models.Joueurs, current_user.id_joueur, {"id_game": id})).first()
+    if not joueur:
+        raise HTTPException(status_code=404, detail="Joueur introuvable")
+    db.commit()
+    # Snapshot de /me en cache : id_game a changé
+    auth.invalidate_user(joueur.id_joueur)
+    events.joueur_joined(joueur)
+    return joueur._asdict()
+
+
+@router.get("/parties/{id}/state", response_model=schemas.PartieState)
+def get_partie_state(id: int, db: Session = Depends(get_db)):
+    """Partie, joueurs, salles ordonnées avec leurs énigmes et progression, en 5 requêtes fixes"""
+    partie = (
+        db.query(models.Partie)
+        .options(selectinload(models.Partie.joueurs))
+        .filter(models.Partie.id_game == id)
+        .first()
+    )
+    if not partie:
+        raise HTTPException(status_code=404, detail="Partie introuvable")
+    joueurs = sorted(partie.joueurs, key=lambda joueur: joueur.id_joueur)
+
+    salles = (
+        db.query(models.Salles)
+        .options(selectinload(models.Salles.enigmes))
+        .order_by(models.Salles.ordre.asc().nulls_last(), models.Salles.id_salle)
+        .all()
+    )
+
+    # Progression par salle : réponses des joueurs de la partie, agrégées en une requête
+    progression = {}
+    if joueurs:
+        progression = {
+            row.id_salle: row
+            for row in db.execute(
+                select(
+                    models.Responses.id_salle,
+                    func.count().label("tentatives"),
+                    func.sum(case((models.Responses.correcte.is_(True), 1), else_=0)).label("correctes"),
+                )
+                .where(models.Responses.id_joueur.in_([joueur.id_joueur for joueur in joueurs]))
+                .group_by(models.Responses.id_salle)
+            )
+        }
+
+    etat_salles = []
+    for salle in salles:
+        stats = progression.get(salle.id_salle)
+        etat_salles.append({
+            "id_salle": salle.id_salle,
+            "name": salle.name,
+            "description": salle.description,
+            "ordre": salle.ordre,
+            "enigmes": sorted(salle.enigmes, key=lambda enigme: enigme.id_enigme),
+            "tentatives": stats.tentatives if stats else 0,
+            "resolue": bool(stats and stats.correctes),
+        })
+    return {"partie": partie, "joueurs": joueurs, "salles": etat_salles}
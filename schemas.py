@@ -1,8 +1,10 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, model_validator
 from typing import Optional, List
 from datetime import date
 from datetime import datetime
 
+from . import clock
+
 
 # Salles
 class SalleBase(BaseModel):
@@ -15,6 +17,10 @@ class SalleCreate(SalleBase):
     pass
 
 
+class SalleUpdate(SalleBase):
+    pass
+
+
 class SalleResponse(SalleBase):
     id_salle: int
 
@@ -28,11 +34,23 @@ class EnigmeBase(BaseModel):
     description: Optional[str] = None
     type_enigme: Optional[str] = None
     indice: Optional[str] = None
+    points: Optional[int] = None
     id_salle: int
 
 
 class EnigmeCreate(EnigmeBase):
-    pass
+    # Jamais renvoyée : absente de EnigmeResponse
+    solution: Optional[str] = None
+
+
+class EnigmeUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    type_enigme: Optional[str] = None
+    indice: Optional[str] = None
+    points: Optional[int] = None
+    id_salle: Optional[int] = None
+    solution: Optional[str] = None
 
 
 class EnigmeResponse(EnigmeBase):
@@ -54,6 +72,13 @@ class MedicamentCreate(MedicamentBase):
     pass
 
 
+class MedicamentUpdate(BaseModel):
+    name: Optional[str] = None
+    composition_1: Optional[str] = None
+    composition_2: Optional[str] = None
+    composition_3: Optional[str] = None
+
+
 class MedicamentResponse(MedicamentBase):
     id_medoc: int
 
@@ -77,6 +102,17 @@ class MaladieCreate(MaladieBase):
     pass
 
 
+class MaladieUpdate(BaseModel):
+    name: Optional[str] = None
+    symptome_1: Optional[str] = None
+    symptome_2: Optional[str] = None
+    symptome_3: Optional[str] = None
+    symptome_4: Optional[str] = None
+    symptome_5: Optional[str] = None
+    frequence_medoc: Optional[int] = None
+    id_medoc: Optional[int] = None
+
+
 class MaladieResponse(MaladieBase):
     id_mal: int
 
@@ -92,15 +128,25 @@ class PartieBase(BaseModel):
     date_fin: Optional[datetime] = None
     temps_restant: Optional[int] = None
     temperature: Optional[float] = None
+    duree: Optional[int] = None
 
 
 class PartieCreate(PartieBase):
     pass
 
 
+class PartieUpdate(PartieBase):
+    pass
+
+
 class PartieResponse(PartieBase):
     id_game: int
 
+    @model_validator(mode="after")
+    def compute_temps_restant(self):
+        self.temps_restant = clock.remaining(self.date_debut, self.duree, self.temps_restant)
+        return self
+
     class Config:
         orm_mode = True
 
@@ -128,22 +174,77 @@ class JoueurResponse(JoueurBase):
 class ReponseBase(BaseModel):
     reponse_saisie: Optional[str] = None
     date_reponse: Optional[date] = None
-    correcte: Optional[bool] = None
     id_salle: int
     id_joueur: int
 
 
+# correcte est calculé par le serveur (answers.py) : ignoré s'il est envoyé
 class ReponseCreate(ReponseBase):
     pass
 
 
+class ReponseUpdate(BaseModel):
+    reponse_saisie: Optional[str] = None
+    date_reponse: Optional[date] = None
+    id_salle: Optional[int] = None
+    id_joueur: Optional[int] = None
+
+
 class ReponseResponse(ReponseBase):
+    correcte: Optional[bool] = None
+    # Énigme résolue, points gagnés et bonus de temps, si la réponse a rapporté des points
+    id_enigme: Optional[int] = None
+    points: Optional[int] = None
+    bonus: Optional[int] = None
     id_resp: int
 
     class Config:
         orm_mode = True
 
 
+# Écriture différée (WRITE_BEHIND) : en_attente, enregistree ou refusee
+class ReponseStatut(BaseModel):
+    id_resp: int
+    statut: str
+    erreur: Optional[str] = None
+
+
+# Diagnostic (GET /maladies/diagnose)
+class Diagnostic(BaseModel):
+    maladie: MaladieResponse
+    correspondances: int
+
+
+# Recherche par composant (GET /medicaments/search)
+class MedicamentMatch(BaseModel):
+    medicament: MedicamentResponse
+    # Composant trouvé, tel qu'enregistré ; score 1 pour un préfixe, similarité des trigrammes sinon
+    composant: str
+    score: float
+    maladie: Optional[MaladieResponse] = None
+
+
+# État d'une partie (GET /parties/{id}/state)
+class SalleState(SalleResponse):
+    enigmes: List[EnigmeResponse] = []
+    tentatives: int = 0
+    resolue: bool = False
+
+
+class PartieState(BaseModel):
+    partie: PartieResponse
+    joueurs: List[JoueurResponse]
+    salles: List[SalleState]
+
+
+# Classement (GET /leaderboard, GET /joueurs/{id}/rank)
+class LeaderboardEntry(BaseModel):
+    rang: int
+    id_joueur: int
+    username: str
+    score: int
+
+
 # Token (auth)
 class Token(BaseModel):
     access_token: str
@@ -152,3 +253,10 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+
+
+# Identité extraite d'un token "complet" (mode sans état, aucune requête en base).
+# Sans id_game : la partie du joueur se lit en base (GET /me), le token ne suit pas ses changements
+class Principal(BaseModel):
+    id_joueur: int
+    username: str
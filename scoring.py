@@ -0,0 +1,249 @@
+import logging
+import os
+from collections import defaultdict
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from dotenv import load_dotenv
+
+from . import models, database, answers, clock, leaderboard, migrations, queries
+
+# Charger les variables d'environnement
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Règles du score : points de l'énigme (SCORE_POINTS si non définis), plus un point de bonus
+# par tranche de SCORE_BONUS_SECONDS restantes dans la partie du joueur.
+# Seule la première réponse correcte d'un joueur à une énigme rapporte des points.
+# Les points gagnés sont enregistrés sur la réponse : modifier ou supprimer la réponse retire
+# exactement ce gain, même si les points de l'énigme ont changé ou si elle a été supprimée.
+SCORE_POINTS = int(os.getenv("SCORE_POINTS", 10))
+SCORE_BONUS_SECONDS = int(os.getenv("SCORE_BONUS_SECONDS", 60))
+
+Responses = models.Responses.__table__
+Joueurs = models.Joueurs.__table__
+Partie = models.Partie.__table__
+
+
+def points(id_enigme):
+    value = answers.index.points(id_enigme)
+    return SCORE_POINTS if value is None else value
+
+
+def prepare(conn, rows, exclude=None):
+    """Renseigne id_enigme / points / bonus des réponses à insérer ; renvoie {id_joueur: points gagnés}.
+    conn : Session ou Connection, dans la transaction de l'INSERT ; exclude : réponse modifiée."""
+    matches = []
+    for row in rows:
+        row["id_enigme"], row["points"], row["bonus"] = None, None, None
+        id_enigme = answers.index.match(row["id_salle"], row.get("reponse_saisie"))
+        if id_enigme is not None:
+            matches.append((row, id_enigme))
+    if not matches:
+        return {}
+
+    ids = {row["id_joueur"] for row, _ in matches}
+    solved_query = (
+        select(Responses.c.id_joueur, Responses.c.id_enigme)
+        .where(Responses.c.id_joueur.in_(ids), Responses.c.id_enigme.is_not(None))
+    )
+    if exclude is not None:
+        solved_query = solved_query.where(Responses.c.id_resp != exclude)
+    solved = set(conn.execute(solved_query).all())
+    remaining = {
+        row.id_joueur: clock.remaining(row.date_debut, row.duree, row.temps_restant)
+        for row in conn.execute(
+            select(Joueurs.c.id_joueur, Partie.c.date_debut, Partie.c.duree, Partie.c.temps_restant)
+            .join(Partie, Partie.c.id_game == Joueurs.c.id_game)
+            .where(Joueurs.c.id_joueur.in_(ids))
+        )
+    }
+
+    deltas = defaultdict(int)
+    for row, id_enigme in matches:
+        key = (row["id_joueur"], id_enigme)
+        if key in solved:
+            continue
+        solved.add(key)
+        bonus = (remaining.get(row["id_joueur"]) or 0) // SCORE_BONUS_SECONDS
+        row["id_enigme"], row["points"], row["bonus"] = id_enigme, points(id_enigme), bonus
+        deltas[row["id_joueur"]] += row["points"] + bonus
+    return dict(deltas)
+
+
+def apply(conn, deltas: dict):
+    """UPDATE joueurs SET score = score + :delta, dans la même transaction que l'INSERT"""
+    if not deltas:
+        return
+    conn.execute(
+        update(Joueurs)
+        .where(Joueurs.c.id_joueur == bindparam("b_id_joueur"))
+        .values(score=func.coalesce(Joueurs.c.score, 0) + bindparam("delta")),
+        [{"b_id_joueur": id_joueur, "delta": delta} for id_joueur, delta in deltas.items()],
+    )
+
+
+def committed(deltas: dict):
+    """Après le commit : classement en mémoire"""
+    for id_joueur, delta in deltas.items():
+        leaderboard.board.add_points(id_joueur, delta)
+
+
+def _without_award(rows):
+    for row in rows:
+        row["id_enigme"], row["points"], row["bonus"] = None, None, None
+    return {}
+
+
+def _award_conflict(exc: IntegrityError):
+    """Violation de ux_responses_id_joueur_id_enigme (Postgres : nom de l'index, SQLite : colonnes)"""
+    message = str(exc.orig)
+    return "ux_responses_id_joueur_id_enigme" in message or "responses.id_joueur, responses.id_enigme" in message
+
+
+# Écritures sur les réponses, commit compris (Session ou Connection, ou AsyncSession via run_sync).
+# Une réponse concurrente peut créditer la même énigme entre prepare() et l'écriture : l'index unique
+# refuse alors la seconde. La transaction est rejouée (l'énigme apparaît désormais résolue), puis,
+# en dernier recours, sans aucun gain : la réponse est toujours enregistrée.
+
+_ATTEMPTS = 3
+
+
+def _write(conn, write):
+    """write(award) -> (résultat, deltas), ou None si la réponse visée n'existe pas"""
+    for attempt in range(_ATTEMPTS):
+        try:
+            outcome = write(attempt < _ATTEMPTS - 1)
+            if outcome is None:
+                conn.rollback()
+                return None
+            result, deltas = outcome
+            apply(conn, deltas)
+            conn.commit()
+        except IntegrityError as exc:
+            conn.rollback()
+            if attempt == _ATTEMPTS - 1 or not _award_conflict(exc):
+                raise
+            continue
+        committed(deltas)
+        return result
+
+
+def insert_responses(conn, rows):
+    """INSERT multi-lignes des réponses et crédit des joueurs ; renvoie les lignes insérées"""
+    def write(award):
+        deltas = prepare(conn, rows) if award else _without_award(rows)
+        return conn.execute(insert(Responses).values(rows).returning(*Responses.c)).all(), deltas
+
+    return _write(conn, write)
+
+
+def _current(conn, id_resp):
+    return conn.execute(select(Responses).where(Responses.c.id_resp == id_resp).with_for_update()).first()
+
+
+def _successor(conn, current):
+    """Autre réponse correcte, non créditée, du même joueur à la même énigme : elle reprend le gain"""
+    candidates = conn.execute(
+        select(Responses.c.id_resp, Responses.c.id_salle, Responses.c.reponse_saisie)
+        .where(
+            Responses.c.id_joueur == current.id_joueur, Responses.c.id_resp != current.id_resp,
+            Responses.c.id_enigme.is_(None), Responses.c.points.is_(None), Responses.c.correcte.is_(True),
+        )
+        .order_by(Responses.c.id_resp)
+    )
+    for candidate in candidates:
+        if answers.index.match(candidate.id_salle, candidate.reponse_saisie) == current.id_enigme:
+            return candidate.id_resp
+    return None
+
+
+def _release(conn, current, deltas):
+    """Gain de current retiré : reporté sur la réponse suivante (renvoyée) ou déduit du score.
+    Énigme supprimée depuis (id_enigme NULL) : pas de successeur, les points enregistrés sont déduits."""
+    if current.points is None:
+        return None
+    successor = _successor(conn, current) if current.id_enigme is not None else None
+    if successor is None:
+        deltas[current.id_joueur] -= current.points + (current.bonus or 0)
+    return successor
+
+
+def _hand_over(conn, successor, current):
+    # Après l'écriture de current : l'index unique n'accepte qu'une réponse créditée
+    if successor is not None:
+        conn.execute(
+            update(Responses).where(Responses.c.id_resp == successor)
+            .values(id_enigme=current.id_enigme, points=current.points, bonus=current.bonus)
+        )
+
+
+def _nonzero(deltas):
+    return {id_joueur: delta for id_joueur, delta in deltas.items() if delta}
+
+
+def update_response(conn, id_resp, values: dict):
+    """PUT/PATCH d'une réponse (values : colonnes envoyées, complétées de correcte, id_enigme, points et bonus).
+    Renvoie la ligne modifiée, ou None si elle n'existe pas."""
+    def write(award):
+        current = _current(conn, id_resp)
+        if current is None:
+            return None
+        row = {**current._asdict(), **values}
+        values["correcte"] = answers.index.check(row["id_salle"], row["reponse_saisie"])
+        new = {key: row[key] for key in ("id_salle", "id_joueur", "reponse_saisie")}
+        deltas = defaultdict(int, prepare(conn, [new], exclude=id_resp) if award else _without_award([new]))
+        successor = None
+        same = (new["id_enigme"], new["id_joueur"]) == (current.id_enigme, current.id_joueur)
+        if same and new["id_enigme"] is not None:
+            # Même énigme pour le même joueur : le gain (points et bonus) est conservé
+            values.update(id_enigme=current.id_enigme, points=current.points, bonus=current.bonus)
+            deltas.clear()
+        else:
+            values.update(id_enigme=new["id_enigme"], points=new["points"], bonus=new["bonus"])
+            successor = _release(conn, current, deltas)
+        updated = conn.execute(queries.update_returning(models.Responses, id_resp, values)).first()
+        _hand_over(conn, successor, current)
+        return updated, _nonzero(deltas)
+
+    return _write(conn, write)
+
+
+def delete_response(conn, id_resp):
+    """DELETE d'une réponse, son gain reporté ou retiré du score ; False si elle n'existe pas"""
+    def write(award):
+        current = _current(conn, id_resp)
+        if current is None:
+            return None
+        deltas = defaultdict(int)
+        successor = _release(conn, current, deltas)
+        conn.execute(delete(Responses).where(Responses.c.id_resp == id_resp))
+        _hand_over(conn, successor, current)
+        return True, _nonzero(deltas)
+
+    return _write(conn, write) is not None
+
+
+# Reconstruction hors ligne : python -m <paquet>.scoring
+
+def rebuild(engine=None):
+    """Recalcule tous les scores en une requête : points et bonus enregistrés sur les réponses
+    correctes créditées, comme le score tenu à jour en direct"""
+    per_response = Responses.c.points + func.coalesce(Responses.c.bonus, 0)
+    earned = (
+        select(func.coalesce(func.sum(per_response), 0))
+        .where(
+            Responses.c.id_joueur == Joueurs.c.id_joueur, Responses.c.correcte.is_(True),
+            Responses.c.points.is_not(None),
+        )
+        .scalar_subquery()
+    )
+    with (engine or database.engine).begin() as conn:
+        return conn.execute(update(Joueurs).values(score=earned)).rowcount
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrations.upgrade(database.engine)
+    logger.info("Scores recalculés pour %s joueurs", rebuild())
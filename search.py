@@ -0,0 +1,261 @@
+import bisect
+import logging
+import math
+import os
+import threading
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import case, func, or_, select, text, union_all
+from sqlalchemy.orm import Session
+from typing import List
+from dotenv import load_dotenv
+
+from . import models, schemas, database, catalogue, fastjson
+from .answers import normalize
+
+# Charger les variables d'environnement
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Recherche de médicaments par composant (préfixe ou approchée), avec la maladie traitée.
+# "auto" : pg_trgm si l'extension est installée sur Postgres, index de trigrammes en mémoire sinon
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+# Similarité minimale (trigrammes communs / trigrammes distincts), comme pg_trgm.similarity_threshold
+SEARCH_THRESHOLD = float(os.getenv("SEARCH_THRESHOLD", 0.3))
+
+COMPOSITIONS = ("composition_1", "composition_2", "composition_3")
+
+router = APIRouter(tags=["Recherche"])
+
+
+def get_db():
+    db = database.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def trigrams(text):
+    """Trigrammes de chaque mot, complétés comme pg_trgm ("  mot ")"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Composants normalisés distincts : trigramme -> composants, et clés triées pour les préfixes"""
+
+    def __init__(self):
+        self._data = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        composants, ids, owners, postings, grams, prefixes = [], {}, [], {}, [], []
+        medicaments, maladies, keys = {}, {}, {}
+        with database.engine.connect() as conn:
+            for row in conn.execute(select(*fastjson.columns(models.Medicaments, schemas.MedicamentResponse))).mappings():
+                row = dict(row)
+                medicaments[row["id_medoc"]] = row
+                for name in COMPOSITIONS:
+                    value = row[name]
+                    if not value:
+                        continue
+                    # Peu de composants distincts pour beaucoup de médicaments : normalisés une seule fois
+                    key = keys.get(value)
+                    if key is None:
+                        key = keys[value] = normalize(value)
+                    if not key:
+                        continue
+                    if key not in ids:
+                        ids[key] = len(composants)
+                        composants.append(key)
+                        owners.append([])
+                        grams.append(frozenset(trigrams(key)))
+                        for gram in grams[-1]:
+                            postings.setdefault(gram, []).append(ids[key])
+                        # Préfixe du composant ou de l'un de ses mots
+                        prefixes.extend((key[i:], ids[key]) for i in range(len(key)) if i == 0 or key[i - 1] == " ")
+                    owners[ids[key]].append((row["id_medoc"], value))
+            for row in conn.execute(select(*fastjson.columns(models.Maladies, schemas.MaladieResponse))).mappings():
+                maladies[row["id_medoc"]] = dict(row)
+        prefixes.sort()
+        with self._lock:
+            self._data = (composants, owners, postings, grams, prefixes, medicaments, maladies)
+
+    def search(self, composant, limit):
+        with self._lock:
+            if self._data is None:
+                return []
+            composants, owners, postings, grams, prefixes, medicaments, maladies = self._data
+        query = normalize(composant)
+        if not query:
+            return []
+
+        scores = {}
+        position = bisect.bisect_left(prefixes, (query,))
+        while position < len(prefixes) and len(scores) < limit and prefixes[position][0].startswith(query):
+            scores[prefixes[position][1]] = 1.0
+            position += 1
+
+        if len(scores) < limit:
+            for composant_id, similarity in self._similar(query, postings, grams):
+                scores.setdefault(composant_id, similarity)
+
+        results, seen = [], set()
+        for composant_id, score in sorted(scores.items(), key=lambda item: (-item[1], composants[item[0]])):
+            for id_medoc, value in owners[composant_id]:
+                if id_medoc in seen:
+                    continue
+                seen.add(id_medoc)
+                results.append({
+                    "medicament": medicaments[id_medoc],
+                    "composant": value,
+                    "score": score,
+                    "maladie": maladies.get(id_medoc),
+                })
+        return results[:limit]
+
+    @staticmethod
+    def _similar(query, postings, grams):
+        """Composants de similarité >= SEARCH_THRESHOLD (trigrammes communs / trigrammes distincts).
+        Au moins ceil(seuil * n) des n trigrammes de la saisie sont partagés : il suffit de parcourir
+        les n - ceil(seuil * n) + 1 listes les plus courtes pour trouver tous les candidats."""
+        wanted = frozenset(trigrams(query))
+        if not wanted:
+            return
+        overlap = max(1, math.ceil(SEARCH_THRESHOLD * len(wanted)))
+        rarest = sorted(wanted, key=lambda gram: len(postings.get(gram, ())))[:len(wanted) - overlap + 1]
+        candidates = set()
+        for gram in rarest:
+            candidates.update(postings.get(gram, ()))
+        low, high = SEARCH_THRESHOLD * len(wanted), len(wanted) / SEARCH_THRESHOLD
+        for composant_id in candidates:
+            if not low <= len(grams[composant_id]) <= high:
+                continue
+            count = len(wanted & grams[composant_id])
+            similarity = count / (len(wanted) + len(grams[composant_id]) - count)
+            if similarity >= SEARCH_THRESHOLD:
+                yield composant_id, similarity
+
+
+index = TrigramIndex()
+_backend = None
+_reload = threading.Event()
+_reload_thread = None
+_reload_lock = threading.Lock()
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _search_pg_trgm(db, composant, limit):
+    """Index GIN gin_trgm_ops sur lower(composition_n) (migration 6) : LIKE préfixe et opérateur %"""
+    query = composant.strip().lower()
+    if not query:
+        return []
+    table = models.Medicaments.__table__
+    pattern = _escape_like(query)
+    parts = []
+    for name in COMPOSITIONS:
+        column = func.lower(table.c[name])
+        prefix = or_(column.like(f"{pattern}%", escape="\\"), column.like(f"% {pattern}%", escape="\\"))
+        parts.append(
+            select(
+                table.c.id_medoc,
+                table.c[name].label("composant"),
+                case((prefix, 1.0), else_=func.similarity(column, query)).label("score"),
+            ).where(or_(prefix, column.op("%")(query)))
+        )
+    matches = union_all(*parts).subquery()
+    # Seuil de l'opérateur %, pour cette transaction seulement
+    db.execute(select(func.set_config("pg_trgm.similarity_threshold", str(SEARCH_THRESHOLD), True)))
+
+    maladies = models.Maladies.__table__
+    medicament_columns = fastjson.columns(models.Medicaments, schemas.MedicamentResponse)
+    maladie_columns = fastjson.columns(models.Maladies, schemas.MaladieResponse)
+    rows = db.execute(
+        select(
+            matches.c.composant, matches.c.score, *medicament_columns,
+            *[column.label(f"maladie_{column.name}") for column in maladie_columns],
+        )
+        .select_from(matches.join(table, table.c.id_medoc == matches.c.id_medoc))
+        .outerjoin(maladies, maladies.c.id_medoc == table.c.id_medoc)
+        .order_by(matches.c.score.desc(), matches.c.composant, table.c.id_medoc)
+        .limit(limit * len(COMPOSITIONS))
+    ).mappings()
+
+    results, seen = [], set()
+    for row in rows:
+        if row["id_medoc"] in seen:
+            continue
+        seen.add(row["id_medoc"])
+        maladie = {column.name: row[f"maladie_{column.name}"] for column in maladie_columns}
+        results.append({
+            "medicament": {column.name: row[column.name] for column in medicament_columns},
+            "composant": row["composant"],
+            "score": row["score"],
+            "maladie": maladie if maladie["id_mal"] is not None else None,
+        })
+    return results[:limit]
+
+
+def _pg_trgm_available():
+    if database.engine.dialect.name != "postgresql":
+        return False
+    with database.engine.connect() as conn:
+        return conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+
+
+def start():
+    """Choisit le moteur au démarrage ; l'index en mémoire n'est construit que s'il sert"""
+    global _backend
+    _backend = SEARCH_BACKEND
+    if _backend == "auto":
+        _backend = "pg_trgm" if _pg_trgm_available() else "memory"
+    if _backend == "memory":
+        index.load()
+    logger.info("Recherche de médicaments : %s", _backend)
+
+
+def _reload_loop():
+    global _reload_thread
+    while True:
+        with _reload_lock:
+            if not _reload.is_set():
+                _reload_thread = None
+                return
+            _reload.clear()
+        try:
+            index.load()
+        except Exception:
+            logger.exception("Rechargement de l'index des composants impossible")
+
+
+def _on_invalidation(table):
+    # Composants (medicaments) ou maladie traitée (maladies) modifiés, ici ou sur un autre worker.
+    # Reconstruction en tâche de fond (plusieurs secondes à 100k médicaments), les écritures
+    # rapprochées n'en déclenchent qu'une ; l'ancien index sert les recherches entre-temps.
+    global _reload_thread
+    if _backend == "memory" and table in ("medicaments", "maladies"):
+        with _reload_lock:
+            _reload.set()
+            if _reload_thread is None:
+                _reload_thread = threading.Thread(target=_reload_loop, name="search-reload", daemon=True)
+                _reload_thread.start()
+
+
+catalogue.bus.subscribe(_on_invalidation)
+
+
+@router.get("/medicaments/search", response_model=List[schemas.MedicamentMatch])
+def search_medicaments(composant: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=100),
+                       db: Session = Depends(get_db)):
+    """Médicaments dont un composant commence par la saisie (score 1) ou lui ressemble"""
+    if _backend == "pg_trgm":
+        return _search_pg_trgm(db, composant, limit)
+    return index.search(composant, limit)
@@ -0,0 +1,81 @@
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from dotenv import load_dotenv
+import os
+
+from . import database, pagination, fastjson
+
+# Charger les variables d'environnement
+load_dotenv()
+
+# Nombre de lignes lues à la fois sur le curseur serveur
+STREAM_BATCH = int(os.getenv("STREAM_BATCH", 1000))
+
+NDJSON = "application/x-ndjson"
+
+
+def wants_stream(request: Request, stream: bool):
+    return stream or NDJSON in request.headers.get("accept", "")
+
+
+def _rows_statement(model, pk, filters, schema):
+    # FAST_JSON : select() des seules colonnes du schéma, lignes SQL sérialisées telles quelles
+    if fastjson.FAST_JSON:
+        stmt = fastjson.select_for(model, schema, filters)
+    else:
+        stmt = pagination.filter_by(select(model), model, filters)
+    return stmt.order_by(pk).execution_options(yield_per=STREAM_BATCH)
+
+
+def _row(i, obj, schema, ndjson):
+    """Un objet sérialisé : ligne NDJSON, ou élément de tableau JSON"""
+    if fastjson.FAST_JSON:
+        data = fastjson.dump_row(obj)
+    else:
+        data = schema.model_validate(obj, from_attributes=True).model_dump_json().encode()
+    if ndjson:
+        return data + b"\n"
+    return b"," + data if i else data
+
+
+def export(request: Request, model, pk, filters: dict, schema):
+    """Export complet d'une table en flux, via un curseur côté serveur (yield_per)"""
+    ndjson = NDJSON in request.headers.get("accept", "")
+    start, end = (b"", b"") if ndjson else (b"[", b"]")
+
+    def body():
+        # Session propre au flux : elle vit le temps de l'envoi, pas de la requête
+        db = database.SessionLocal()
+        try:
+            result = db.execute(_rows_statement(model, pk, filters, schema))
+            if not fastjson.FAST_JSON:
+                result = result.scalars()
+            yield start
+            for i, obj in enumerate(result):
+                yield _row(i, obj, schema, ndjson)
+            yield end
+        finally:
+            db.close()
+
+    return StreamingResponse(body(), media_type=NDJSON if ndjson else "application/json")
+
+
+def export_async(request: Request, model, pk, filters: dict, schema):
+    """Variante AsyncSession de export()"""
+    ndjson = NDJSON in request.headers.get("accept", "")
+    start, end = (b"", b"") if ndjson else (b"[", b"]")
+
+    async def body():
+        async with database.AsyncSessionLocal() as db:
+            result = await db.stream(_rows_statement(model, pk, filters, schema))
+            if not fastjson.FAST_JSON:
+                result = result.scalars()
+            yield start
+            i = 0
+            async for obj in result:
+                yield _row(i, obj, schema, ndjson)
+                i += 1
+            yield end
+
+    return StreamingResponse(body(), media_type=NDJSON if ndjson else "application/json")
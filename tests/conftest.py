@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+# Base SQLite jetable et routes CRUD asynchrones (aiosqlite) : à définir avant d'importer l'application
+_DB = os.path.join(tempfile.mkdtemp(prefix="escape-tests-"), "test.db")
+os.environ.update({
+    "SECRET_KEY": "tests",
+    "DATABASE_URL": f"sqlite:///{_DB}",
+    "ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{_DB}",
+    "ASYNC_DB": "true",
+    "CATALOGUE_BUS": "local",
+    "HASH_EXECUTOR": "thread",
+    "LEADERBOARD_REFRESH": "0",
+})
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from .. import main, models, database, auth, answers, diagnosis, search, leaderboard, catalogue
+
+# Tables conservées entre les tests
+_KEPT = {"schema_migrations", "table_versions"}
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Application complète : routes CRUD asynchrones (ASYNC_DB=true) sur aiosqlite"""
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def sync_client(client):
+    """Routes CRUD synchrones de main.py, montées à part (l'état global est celui de client)"""
+    app = FastAPI()
+    app.include_router(auth.router)
+    app.include_router(main.router)
+    for exc, handler in main.app.exception_handlers.items():
+        app.add_exception_handler(exc, handler)
+    return TestClient(app)
+
+
+@pytest.fixture(params=["sync", "async"])
+def crud(request, client, sync_client):
+    """Chaque test qui l'utilise passe par les deux chemins CRUD"""
+    return sync_client if request.param == "sync" else client
+
+
+@pytest.fixture(autouse=True)
+def clean_db(client):
+    """Base vide et index en mémoire rechargés avant chaque test"""
+    with database.engine.begin() as conn:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            if table.name not in _KEPT:
+                conn.execute(table.delete())
+    for table in catalogue.TABLES:
+        catalogue.invalidate_local(table)
+    auth.token_cache.clear()
+    auth.token_version_cache.clear()
+    answers.index.load()
+    diagnosis.index.load()
+    search.index.load()
+    leaderboard.seed()
+
+
+@pytest.fixture
+def make_user():
+    """Crée un joueur directement en base (sans bcrypt) : (id_joueur, en-têtes d'authentification)"""
+    def make(username="joueur", id_game=None, score=0):
+        with database.engine.begin() as conn:
+            id_joueur = conn.execute(
+                insert(models.Joueurs)
+                .values(username=username, password="!", score=score, id_game=id_game)
+                .returning(models.Joueurs.id_joueur)
+            ).scalar()
+        leaderboard.board.update(id_joueur, username, score)
+        token = auth.create_access_token({"sub": username})
+        return id_joueur, {"Authorization": f"Bearer {token}"}
+
+    return make
+
+
+@pytest.fixture
+def headers(make_user):
+    return make_user()[1]
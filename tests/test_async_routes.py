@@ -0,0 +1,103 @@
+import asyncio
+from inspect import iscoroutinefunction
+
+from fastapi.dependencies.utils import is_async_gen_callable, is_coroutine_callable
+from sqlalchemy import event
+
+from .. import async_routes, auth, catalogue, database
+
+
+def _calls(dependant):
+    for dependency in dependant.dependencies:
+        yield dependency.call
+        yield from _calls(dependency)
+
+
+def test_routes_and_dependencies_stay_on_the_event_loop():
+    # Toute dépendance synchrone serait exécutée dans le threadpool par FastAPI
+    for route in async_routes.router.routes:
+        assert iscoroutinefunction(route.endpoint), route.path
+        for call in _calls(route.dependant):
+            assert is_coroutine_callable(call) or is_async_gen_callable(call), (route.path, call)
+
+
+def test_crud_round_trip(client, headers):
+    created = client.post("/salles", json={"name": "Labo", "ordre": 2}, headers=headers)
+    assert created.status_code == 200
+    id_salle = created.json()["id_salle"]
+    client.post("/salles", json={"name": "Cave", "ordre": 1}, headers=headers)
+
+    assert client.get(f"/salles/{id_salle}").json()["name"] == "Labo"
+    page = client.get("/salles", params={"limit": 1})
+    assert [salle["id_salle"] for salle in page.json()] == [id_salle]
+    assert page.headers["X-Next-After"] == str(id_salle)
+
+    assert client.patch(f"/salles/{id_salle}", json={"ordre": 5}, headers=headers).json()["ordre"] == 5
+    replaced = client.put(f"/salles/{id_salle}", json={"name": "Labo 2"}, headers=headers).json()
+    assert replaced == {"id_salle": id_salle, "name": "Labo 2", "description": None, "ordre": None}
+
+    assert client.delete(f"/salles/{id_salle}", headers=headers).status_code == 200
+    assert client.get(f"/salles/{id_salle}").status_code == 404
+
+
+def test_writes_require_a_token(client):
+    assert client.post("/salles", json={"name": "Labo"}).status_code == 401
+    bad = {"Authorization": "Bearer invalide"}
+    assert client.post("/salles", json={"name": "Labo"}, headers=bad).status_code == 401
+
+
+def test_unknown_user_is_rejected(client):
+    token = auth.create_access_token({"sub": "fantome"})
+    response = client.post("/salles", json={"name": "Labo"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 404
+
+
+def test_authenticated_writes_use_only_the_async_pool(client, headers):
+    checkouts = []
+
+    def on_checkout(*args):
+        checkouts.append(args)
+
+    event.listen(database.engine, "checkout", on_checkout)
+    try:
+        # Parties : aucun index en mémoire à recharger après l'écriture
+        id_game = client.post("/parties", json={"duree": 600}, headers=headers).json()["id_game"]
+        assert client.patch(f"/parties/{id_game}", json={"etat_sante": "ok"}, headers=headers).status_code == 200
+        assert client.delete(f"/parties/{id_game}", headers=headers).status_code == 200
+    finally:
+        event.remove(database.engine, "checkout", on_checkout)
+    assert checkouts == []
+
+
+def test_catalogue_versions_are_read_through_the_async_session(client, headers):
+    checkouts = []
+
+    def on_checkout(*args):
+        checkouts.append(args)
+
+    event.listen(database.engine, "checkout", on_checkout)
+    try:
+        # Salles : version (ETag) lue et invalidation publiée sans l'engine synchrone
+        id_salle = client.post("/salles", json={"name": "Labo", "ordre": 1}, headers=headers).json()["id_salle"]
+        etag = client.get(f"/salles/{id_salle}").headers["etag"]
+        assert client.get(f"/salles/{id_salle}", headers={"If-None-Match": etag}).status_code == 304
+        assert client.patch(f"/salles/{id_salle}", json={"name": "Cave"}, headers=headers).status_code == 200
+        assert client.get(f"/salles/{id_salle}", headers={"If-None-Match": etag}).json()["name"] == "Cave"
+    finally:
+        event.remove(database.engine, "checkout", on_checkout)
+    assert checkouts == []
+
+
+def test_postgres_bus_notifies_on_the_request_session():
+    executed = []
+
+    class Session:
+        async def execute(self, statement, params):
+            executed.append((str(statement), params))
+
+        async def commit(self):
+            executed.append("commit")
+
+    bus = catalogue.PostgresBus(None, "canal")
+    asyncio.run(bus.publish_async(Session(), "salles"))
+    assert executed == [("SELECT pg_notify(:channel, :payload)", {"channel": "canal", "payload": "salles"}), "commit"]
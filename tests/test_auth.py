@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from .. import auth, hashing
+
+
+def _login(client, username="alice", password="secret"):
+    client.post("/signup", json={"username": username, "email": f"{username}@example.com", "password": password})
+    token = client.post("/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_logout_revokes_classic_tokens(client):
+    headers = _login(client)
+    assert client.get("/me", headers=headers).status_code == 200
+    assert client.post("/logout", headers=headers).status_code == 200
+    assert client.get("/me", headers=headers).status_code == 401
+    assert client.get("/me", headers=_login(client)).status_code == 200
+
+
+def test_logout_refuses_unversioned_tokens(client, headers):
+    # Token émis sans "ver" : la déconnexion ne prétend pas l'avoir révoqué
+    assert client.post("/logout", headers=headers).status_code == 400
+    assert client.get("/me", headers=headers).status_code == 200
+
+
+def test_logout_revokes_every_token_of_the_player(client):
+    first, second = _login(client), _login(client, "alice")
+    assert client.get("/me", headers=second).status_code == 200
+    client.post("/logout", headers=first)
+    assert client.get("/me", headers=second).status_code == 401
+
+
+def test_stateless_tokens_do_not_carry_the_game(client, monkeypatch):
+    monkeypatch.setattr(auth, "STATELESS_AUTH", True)
+    headers = _login(client)
+    token = headers["Authorization"].split()[1]
+    assert "id_game" not in auth.decode_token(token)
+
+    id_game = client.post("/parties", json={"duree": 600}, headers=headers).json()["id_game"]
+    assert client.post(f"/parties/{id_game}/joueurs", headers=headers).status_code == 200
+    # Même token : la partie rejointe vient de la base, pas d'un claim figé à la connexion
+    assert client.get("/me", headers=headers).json()["id_game"] == id_game
+    assert not hasattr(auth._cached_identity(token)[1], "id_game")
+
+
+def test_login_ignores_a_stale_version_cache(client):
+    headers = _login(client)
+    id_joueur = client.get("/me", headers=headers).json()["id_joueur"]
+    client.post("/logout", headers=headers)
+    # Autre worker : version 0 encore en cache au moment du /login
+    auth.token_version_cache.set(id_joueur, 0, time.time() + 30)
+    fresh = _login(client)
+    assert auth.decode_token(fresh["Authorization"].split()[1])["ver"] == 1
+    assert client.get("/me", headers=fresh).status_code == 200
+
+
+def test_process_executor_does_not_fork_the_worker(monkeypatch):
+    monkeypatch.setattr(hashing, "HASH_EXECUTOR", "process")
+    monkeypatch.setattr(hashing, "HASH_WORKERS", 1)
+    monkeypatch.setattr(hashing, "_executor", None)
+    try:
+        executor = hashing.get_executor()
+        assert executor._mp_context.get_start_method() in ("forkserver", "spawn")
+        assert hashing.pwd_context.verify("secret", asyncio.run(hashing.hash_password("secret")))
+    finally:
+        hashing.shutdown()
@@ -0,0 +1,36 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from .. import clock
+
+
+def test_threadpool_writes_are_applied_on_the_loop():
+    async def scenario():
+        ticker = clock.Clock()
+        ticker.start()
+        queue = await asyncio.wait_for(_subscribe(ticker, 1), 1)
+        partie = SimpleNamespace(id_game=1, date_debut=None, duree=None, temps_restant=42)
+        # Thread du threadpool, boucle occupée : rien ne change avant que la boucle reprenne la main
+        writer = threading.Thread(target=ticker.changed, args=(partie,))
+        writer.start()
+        writer.join()
+        assert ticker._parties[1] is None
+        await asyncio.sleep(0)
+        assert ticker._parties[1] == (None, None, 42)
+
+        writer = threading.Thread(target=ticker.deleted, args=(1,))
+        writer.start()
+        writer.join()
+        await asyncio.sleep(0)
+        assert ticker._parties[1] is None
+        ticker.unsubscribe(1, queue)
+        await ticker.stop()
+
+    asyncio.run(scenario())
+
+
+async def _subscribe(ticker, id_game):
+    # Partie déjà suivie (sans lecture en base) : état initial "supprimée"
+    ticker._parties[id_game] = None
+    return await ticker.subscribe(id_game)
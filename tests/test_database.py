@@ -0,0 +1,12 @@
+from .. import database
+
+
+def test_each_engine_has_its_own_pool_metrics(client, headers):
+    before = database.pool_stats()["checkouts"], database.pool_stats(database.async_engine)["checkouts"]
+    # Routes CRUD asynchrones : seul le pool de l'AsyncEngine sert
+    client.post("/parties", json={"duree": 600}, headers=headers)
+    after = database.pool_stats()["checkouts"], database.pool_stats(database.async_engine)["checkouts"]
+    assert after[0] == before[0] and after[1] > before[1]
+
+    database.engine.dispose()
+    assert database.pool_stats()["checkouts"] == before[0]
@@ -0,0 +1,61 @@
+import random
+
+from sqlalchemy import delete, insert, select, update
+
+from .. import models, database, diagnosis
+from ..answers import normalize
+
+SYMPTOMES = ["fièvre", "toux", "Fatigue", "nausée", "maux de tête", "frissons", "éruption"]
+
+
+def _expected(symptomes, limit):
+    """Référence naïve : parcours de toutes les maladies"""
+    wanted = {normalize(symptome) for symptome in symptomes}
+    with database.engine.connect() as conn:
+        rows = conn.execute(select(models.Maladies).order_by(models.Maladies.id_mal)).all()
+    scored = []
+    for row in rows:
+        own = {normalize(getattr(row, name)) for name in diagnosis.SYMPTOMES if getattr(row, name)}
+        if own & wanted:
+            scored.append((-len(own & wanted), row.id_mal))
+    return [(id_mal, -count) for count, id_mal in sorted(scored)[:limit]]
+
+
+def _check(index, rng):
+    for _ in range(20):
+        symptomes = rng.sample(SYMPTOMES, rng.randint(1, 4))
+        limit = rng.randint(1, 8)
+        found = [(item["maladie"]["id_mal"], item["correspondances"]) for item in index.diagnose(symptomes, limit)]
+        assert found == _expected(symptomes, limit), symptomes
+
+
+def _maladie(rng, id_medoc):
+    chosen = rng.sample(SYMPTOMES, rng.randint(0, 5)) + [None] * 5
+    return {"name": f"M{id_medoc}", "id_medoc": id_medoc, **dict(zip(diagnosis.SYMPTOMES, chosen))}
+
+
+def test_incremental_updates_match_a_full_scan():
+    rng = random.Random(7)
+    index = diagnosis.SymptomIndex()
+    with database.engine.begin() as conn:
+        medocs = [conn.execute(insert(models.Medicaments).values(name=f"D{i}").returning(models.Medicaments.id_medoc))
+                  .scalar() for i in range(60)]
+        conn.execute(insert(models.Maladies), [_maladie(rng, id_medoc) for id_medoc in medocs[:40]])
+    index.load()
+    _check(index, rng)
+
+    for _ in range(5):
+        with database.engine.begin() as conn:
+            ids = list(conn.execute(select(models.Maladies.id_mal)).scalars())
+            conn.execute(delete(models.Maladies).where(models.Maladies.id_mal.in_(rng.sample(ids, 3))))
+            for id_mal in rng.sample(ids, 5):
+                conn.execute(update(models.Maladies).where(models.Maladies.id_mal == id_mal)
+                             .values(symptome_1=rng.choice(SYMPTOMES), symptome_2=None))
+            used = set(conn.execute(select(models.Maladies.id_medoc)).scalars())
+            free = [id_medoc for id_medoc in medocs if id_medoc not in used]
+            conn.execute(insert(models.Maladies), [_maladie(rng, id_medoc) for id_medoc in rng.sample(free, 2)])
+        slots = dict(index._slots)
+        index.load()
+        _check(index, rng)
+        # Maladies conservées : même emplacement (pas de reconstruction complète)
+        assert all(index._slots[id_mal] == slot for id_mal, slot in slots.items() if id_mal in index._slots)
@@ -0,0 +1,70 @@
+from datetime import date, datetime
+from typing import List
+
+import pytest
+from sqlalchemy import insert
+
+from .. import models, schemas, database, catalogue, fastjson, queries
+
+# Toutes les listes servies par FAST_JSON : chemin, modèle, schéma de réponse
+LISTS = [
+    ("/salles", models.Salles, schemas.SalleResponse),
+    ("/enigmes", models.Enigme, schemas.EnigmeResponse),
+    ("/medicaments", models.Medicaments, schemas.MedicamentResponse),
+    ("/maladies", models.Maladies, schemas.MaladieResponse),
+    ("/parties", models.Partie, schemas.PartieResponse),
+    ("/joueurs", models.Joueurs, schemas.JoueurResponse),
+    ("/reponses", models.Responses, schemas.ReponseResponse),
+]
+
+
+@pytest.fixture
+def rows():
+    """Une ligne remplie et une ligne aux colonnes facultatives NULL par table"""
+    with database.engine.begin() as conn:
+        def add(model, *values):
+            return [conn.execute(insert(model).values(**value).returning(queries.primary_key(model))).scalar()
+                    for value in values]
+
+        salle, _ = add(models.Salles, {"name": "Labo", "description": "Paillasses", "ordre": 1}, {})
+        add(models.Enigme, {"name": "Coffre", "id_salle": salle, "indice": "4 chiffres", "points": 5},
+            {"name": "Porte", "id_salle": salle})
+        medoc, other = add(models.Medicaments, {"name": "Doliprane", "composition_1": "paracétamol"},
+                           {"name": "Vide"})
+        add(models.Maladies, {"name": "Grippe", "symptome_1": "fièvre", "frequence_medoc": 3, "id_medoc": medoc},
+            {"name": "Rhume", "id_medoc": other})
+        game, _, _ = add(
+            models.Partie,
+            {"nombre_joueurs": 2, "etat_sante": "stable", "date_debut": datetime(2024, 3, 1, 9, 30, 15, 250000),
+             "date_fin": datetime(2024, 3, 1, 10, 0), "temperature": 37.25, "duree": 600},
+            {"temps_restant": 120, "temperature": 36.6},
+            {},
+        )
+        joueur, _ = add(models.Joueurs, {"username": "alice", "email": "alice@example.com", "password": "!",
+                                         "score": 12, "id_game": game},
+                        {"username": "bob", "password": "!"})
+        add(models.Responses, {"reponse_saisie": "clé", "date_reponse": date(2024, 3, 1), "correcte": True,
+                               "id_salle": salle, "id_joueur": joueur, "bonus": 2},
+            {"id_salle": salle, "id_joueur": joueur})
+
+
+@pytest.mark.parametrize("path,model,schema", LISTS, ids=[path for path, _, _ in LISTS])
+def test_rows_serialize_like_the_response_model(rows, path, model, schema):
+    pk = queries.primary_key(model)
+    with database.SessionLocal() as db:
+        fast = fastjson.dump_rows(db.execute(fastjson.select_for(model, schema, {}).order_by(pk)).all())
+        validated = catalogue.dump(List[schema], db.query(model).order_by(pk).all())
+    assert fast == validated
+
+
+@pytest.mark.parametrize("path,model,schema", LISTS, ids=[path for path, _, _ in LISTS])
+def test_list_endpoints_answer_the_same(crud, headers, rows, monkeypatch, path, model, schema):
+    def get(fast):
+        monkeypatch.setattr(fastjson, "FAST_JSON", fast)
+        for table in catalogue.TABLES:
+            catalogue.invalidate_local(table)
+        response = crud.get(path, params={"limit": 1}, headers=headers)
+        assert response.status_code == 200
+        return response.json(), response.headers.get("X-Next-After"), crud.get(path, headers=headers).json()
+
+    assert get(True) == get(False)
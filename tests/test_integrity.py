@@ -0,0 +1,30 @@
+import json
+import sqlite3
+
+from sqlalchemy.exc import IntegrityError
+from starlette.requests import Request
+
+from .. import main
+
+
+def test_unknown_reference_is_unprocessable(crud, headers):
+    response = crud.post("/maladies", json={"name": "Grippe", "id_medoc": 12345}, headers=headers)
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Référence vers un élément inexistant"
+
+
+def test_duplicate_is_a_conflict(crud, headers):
+    id_medoc = crud.post("/medicaments", json={"name": "Doliprane"}, headers=headers).json()["id_medoc"]
+    assert crud.post("/maladies", json={"name": "Grippe", "id_medoc": id_medoc}, headers=headers).status_code == 200
+    response = crud.post("/maladies", json={"name": "Rhume", "id_medoc": id_medoc}, headers=headers)
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Valeur déjà utilisée par un autre élément"
+
+
+def test_restricted_delete_is_a_conflict():
+    # ON DELETE RESTRICT (FK_ON_DELETE=RESTRICT) : seul cas où la clé étrangère signale des éléments liés
+    exc = IntegrityError("DELETE", {}, sqlite3.IntegrityError("FOREIGN KEY constraint failed"))
+    request = Request({"type": "http", "method": "DELETE", "headers": []})
+    response = main.integrity_error_handler(request, exc)
+    assert response.status_code == 409
+    assert json.loads(response.body)["detail"] == "Opération refusée : éléments liés en base"
@@ -0,0 +1,25 @@
+from .. import leaderboard
+
+
+def _scores(board):
+    return {entry["id_joueur"]: entry["score"] for entry in board.top(10)}
+
+
+def test_reload_keeps_writes_made_during_the_select():
+    board = leaderboard.Leaderboard()
+    board.load([(1, "alice", 0), (2, "bob", 3), (3, "carol", 1)])
+
+    since = board.generation()
+    # Lecture de joueurs.score, puis écritures locales avant le remplacement
+    rows = [(1, "alice", 0), (2, "bob", 3), (3, "carol", 4)]
+    board.add_points(1, 5)
+    board.remove(2)
+    board.update(4, "dave", 2)
+    board.load(rows, since)
+
+    assert _scores(board) == {1: 5, 3: 4, 4: 2}
+    assert board.rank(1)["rang"] == 1
+
+    # Écritures déjà vues par la lecture suivante : la base fait foi
+    board.load([(1, "alice", 7), (3, "carol", 4)], board.generation())
+    assert _scores(board) == {1: 7, 3: 4}
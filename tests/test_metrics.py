@@ -0,0 +1,7 @@
+from .. import main
+
+
+def test_metrics_are_hidden_by_default(client, monkeypatch):
+    assert client.get("/internal/metrics").status_code == 404
+    monkeypatch.setattr(main, "INTERNAL_METRICS", True)
+    assert "write_behind" in client.get("/internal/metrics").json()
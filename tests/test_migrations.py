@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import create_engine, event, inspect, text
+
+from .. import database, migrations, models
+
+
+def test_duplicate_usernames_are_reported_before_the_unique_index():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE joueurs (id_joueur INTEGER PRIMARY KEY, username VARCHAR(50), id_game INTEGER)"))
+        for table in ("enigme", "responses"):
+            conn.execute(text(f"CREATE TABLE {table} (id_salle INTEGER, id_joueur INTEGER)"))
+        conn.execute(text("INSERT INTO joueurs (username) VALUES ('alice'), ('alice'), ('bob')"))
+        with pytest.raises(RuntimeError, match=r"1 noms d'utilisateur en double.*'alice' \(2\)"):
+            migrations._m1_indexes(conn)
+        conn.execute(text("DELETE FROM joueurs WHERE id_joueur = 2"))
+        migrations._m1_indexes(conn)
+
+
+def test_sqlite_tables_are_rebuilt_with_the_model_on_delete(tmp_path):
+    # Schéma d'origine : clés étrangères sans ON DELETE
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    event.listen(engine, "connect", database._enable_sqlite_foreign_keys)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE salles (id_salle INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL, ordre INTEGER)"))
+        conn.execute(text(
+            "CREATE TABLE enigme (id_enigme INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL, "
+            "id_salle INTEGER NOT NULL REFERENCES salles (id_salle))"
+        ))
+        conn.execute(text("INSERT INTO salles (id_salle, name) VALUES (1, 'Labo')"))
+        conn.execute(text("INSERT INTO enigme (id_enigme, name, id_salle) VALUES (1, 'Code', 1)"))
+    models.Base.metadata.create_all(bind=engine)
+    assert ("enigme", ("id_salle",), "NO ACTION", models.FK_ON_DELETE) in migrations.on_delete_mismatches(engine)
+
+    migrations.upgrade(engine)
+
+    assert migrations.on_delete_mismatches(engine) == []
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT name FROM enigme")).scalar() == "Code"
+        assert "ix_enigme_id_salle" in {ix["name"] for ix in inspect(conn).get_indexes("enigme")}
+        conn.execute(text("DELETE FROM salles WHERE id_salle = 1"))
+        assert conn.execute(text("SELECT COUNT(*) FROM enigme")).scalar() == 0
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
@@ -0,0 +1,31 @@
+from .. import pagination
+
+
+def test_lists_without_parameters_are_not_truncated(crud, headers, monkeypatch):
+    monkeypatch.setattr(pagination, "PAGE_SIZE", 2)
+    ids = [crud.post("/salles", json={"name": f"Salle {i}"}, headers=headers).json()["id_salle"] for i in range(4)]
+
+    everything = crud.get("/salles")
+    assert [salle["id_salle"] for salle in everything.json()] == ids
+    assert "X-Next-After" not in everything.headers
+
+    first = crud.get("/salles", params={"limit": 2})
+    assert first.headers["X-Next-After"] == str(ids[1])
+    # after seul : pages de PAGE_SIZE
+    assert [salle["id_salle"] for salle in crud.get("/salles", params={"after": ids[0]}).json()] == ids[1:3]
+
+
+def test_growing_lists_are_paginated_by_default(crud, client, headers, monkeypatch):
+    monkeypatch.setattr(pagination, "PAGE_SIZE", 2)
+    id_salle = crud.post("/salles", json={"name": "Labo"}, headers=headers).json()["id_salle"]
+    id_joueur = crud.get("/joueurs").json()[0]["id_joueur"]
+    for i in range(3):
+        crud.post("/reponses", json={"reponse_saisie": str(i), "id_salle": id_salle, "id_joueur": id_joueur},
+                  headers=headers)
+
+    first = crud.get("/reponses")
+    assert len(first.json()) == 2
+    rest = crud.get("/reponses", params={"after": first.headers["X-Next-After"]})
+    assert len(rest.json()) == 1 and "X-Next-After" not in rest.headers
+    # Export complet : le flux
+    assert len(client.get("/reponses", params={"stream": 1}).json()) == 3
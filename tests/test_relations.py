@@ -0,0 +1,50 @@
+from sqlalchemy import event, insert
+
+from .. import models, database
+
+
+def _grow(id_game, n):
+    """n salles de n énigmes, n joueurs dans la partie, une réponse par joueur et par salle"""
+    with database.engine.begin() as conn:
+        for i in range(n):
+            id_salle = conn.execute(
+                insert(models.Salles).values(name=f"Salle {i}", ordre=i).returning(models.Salles.id_salle)
+            ).scalar()
+            conn.execute(insert(models.Enigme), [
+                {"name": f"Enigme {i}.{j}", "id_salle": id_salle, "solution": "x"} for j in range(n)
+            ])
+            id_joueur = conn.execute(
+                insert(models.Joueurs).values(username=f"joueur {id_game}.{i}", password="!", score=0, id_game=id_game)
+                .returning(models.Joueurs.id_joueur)
+            ).scalar()
+            conn.execute(insert(models.Responses), [
+                {"id_salle": id_salle, "id_joueur": id_joueur, "reponse_saisie": "x", "correcte": j == 0}
+                for j in range(n)
+            ])
+
+
+def _count_queries(client, path):
+    statements = []
+
+    def on_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", on_execute)
+    try:
+        response = client.get(path)
+    finally:
+        event.remove(database.engine, "before_cursor_execute", on_execute)
+    assert response.status_code == 200
+    return len(statements), response.json()
+
+
+def test_partie_state_query_count_does_not_grow(client, headers):
+    counts = []
+    for n in (1, 3, 6):
+        id_game = client.post("/parties", json={"duree": 600}, headers=headers).json()["id_game"]
+        _grow(id_game, n)
+        count, state = _count_queries(client, f"/parties/{id_game}/state")
+        assert len(state["joueurs"]) == n
+        assert all(salle["enigmes"] for salle in state["salles"])
+        counts.append(count)
+    assert counts[0] == counts[1] == counts[2] <= 5, counts
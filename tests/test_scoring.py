@@ -0,0 +1,139 @@
+import pytest
+from sqlalchemy import insert, select
+
+from .. import models, database, scoring
+
+
+@pytest.fixture
+def enigme(crud, headers):
+    id_salle = crud.post("/salles", json={"name": "Labo"}, headers=headers).json()["id_salle"]
+    enigme = crud.post(
+        "/enigmes", json={"name": "Coffre", "id_salle": id_salle, "solution": "clé|cle", "points": 5}, headers=headers
+    ).json()
+    return enigme
+
+
+def _score(id_joueur):
+    with database.engine.connect() as conn:
+        return conn.execute(select(models.Joueurs.score).where(models.Joueurs.id_joueur == id_joueur)).scalar()
+
+
+def _answer(crud, headers, enigme, id_joueur, saisie):
+    response = crud.post(
+        "/reponses", json={"id_salle": enigme["id_salle"], "id_joueur": id_joueur, "reponse_saisie": saisie},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_edits_move_the_award(crud, make_user, enigme):
+    id_joueur, headers = make_user("alice")
+    reponse = _answer(crud, headers, enigme, id_joueur, "Clé")
+    assert (reponse["correcte"], reponse["id_enigme"], _score(id_joueur)) == (True, enigme["id_enigme"], 5)
+
+    wrong = crud.put(
+        f"/reponses/{reponse['id_resp']}",
+        json={"id_salle": enigme["id_salle"], "id_joueur": id_joueur, "reponse_saisie": "porte"}, headers=headers,
+    ).json()
+    assert (wrong["correcte"], wrong["id_enigme"], wrong["bonus"], _score(id_joueur)) == (False, None, None, 0)
+
+    right = crud.patch(f"/reponses/{reponse['id_resp']}", json={"reponse_saisie": "cle"}, headers=headers).json()
+    assert (right["correcte"], right["id_enigme"], _score(id_joueur)) == (True, enigme["id_enigme"], 5)
+
+    # Champ sans rapport avec la réponse : gain conservé, pas crédité deux fois
+    crud.patch(f"/reponses/{reponse['id_resp']}", json={"date_reponse": "2026-01-01"}, headers=headers)
+    assert _score(id_joueur) == 5
+
+    assert crud.delete(f"/reponses/{reponse['id_resp']}", headers=headers).status_code == 200
+    assert _score(id_joueur) == 0
+    assert crud.delete(f"/reponses/{reponse['id_resp']}", headers=headers).status_code == 404
+
+
+def test_award_moves_to_the_new_player(crud, make_user, enigme):
+    alice, headers = make_user("alice")
+    bob, _ = make_user("bob")
+    reponse = _answer(crud, headers, enigme, alice, "clé")
+    crud.patch(f"/reponses/{reponse['id_resp']}", json={"id_joueur": bob}, headers=headers)
+    assert (_score(alice), _score(bob)) == (0, 5)
+
+
+def test_award_passes_to_the_next_correct_response(crud, make_user, enigme):
+    id_joueur, headers = make_user("alice")
+    first = _answer(crud, headers, enigme, id_joueur, "clé")
+    second = _answer(crud, headers, enigme, id_joueur, "cle")
+    assert second["id_enigme"] is None
+
+    crud.patch(f"/reponses/{first['id_resp']}", json={"reponse_saisie": "porte"}, headers=headers)
+    assert _score(id_joueur) == 5
+    assert crud.delete(f"/reponses/{second['id_resp']}", headers=headers).status_code == 200
+    assert _score(id_joueur) == 0
+
+
+def test_points_changes_do_not_alter_awarded_scores(crud, make_user, enigme):
+    id_joueur, headers = make_user("alice")
+    reponse = _answer(crud, headers, enigme, id_joueur, "clé")
+    assert reponse["points"] == 5
+
+    crud.patch(f"/enigmes/{enigme['id_enigme']}", json={"points": 20}, headers=headers)
+    scoring.rebuild()
+    assert _score(id_joueur) == 5
+    assert crud.delete(f"/reponses/{reponse['id_resp']}", headers=headers).status_code == 200
+    assert _score(id_joueur) == 0
+
+
+def test_deleted_enigme_keeps_the_award(crud, make_user, enigme):
+    id_joueur, headers = make_user("alice")
+    reponse = _answer(crud, headers, enigme, id_joueur, "clé")
+    assert crud.delete(f"/enigmes/{enigme['id_enigme']}", headers=headers).status_code == 200
+
+    scoring.rebuild()
+    assert _score(id_joueur) == 5
+    assert crud.delete(f"/reponses/{reponse['id_resp']}", headers=headers).status_code == 200
+    assert _score(id_joueur) == 0
+    scoring.rebuild()
+    assert _score(id_joueur) == 0
+
+
+def test_rebuild_matches_live_scores(crud, make_user, enigme):
+    alice, headers = make_user("alice")
+    bob, _ = make_user("bob")
+    carol, _ = make_user("carol")
+    reponse = _answer(crud, headers, enigme, alice, "clé")
+    _answer(crud, headers, enigme, alice, "clé")
+    crud.patch(f"/reponses/{reponse['id_resp']}", json={"reponse_saisie": "porte"}, headers=headers)
+    _answer(crud, headers, enigme, bob, "clé")
+
+    # Ligne héritée d'avant la correction : énigme renseignée mais réponse fausse
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.Responses).values(
+            id_salle=enigme["id_salle"], id_joueur=carol, reponse_saisie="porte", correcte=False,
+            id_enigme=enigme["id_enigme"], bonus=3,
+        ))
+    live = (_score(alice), _score(bob), _score(carol))
+    scoring.rebuild()
+    assert (_score(alice), _score(bob), _score(carol)) == live == (5, 5, 0)
+
+
+def test_concurrent_award_keeps_the_response(crud, make_user, enigme, monkeypatch):
+    id_joueur, headers = make_user("alice")
+    prepare = scoring.prepare
+    calls = []
+
+    def racing_prepare(conn, rows, exclude=None):
+        deltas = prepare(conn, rows, exclude)
+        if not calls:
+            # Une autre requête crédite la même énigme juste après la lecture
+            with database.engine.begin() as other:
+                other.execute(insert(models.Responses).values(
+                    id_salle=enigme["id_salle"], id_joueur=id_joueur, reponse_saisie="clé", correcte=True,
+                    id_enigme=enigme["id_enigme"], bonus=0,
+                ))
+        calls.append(deltas)
+        return deltas
+
+    monkeypatch.setattr(scoring, "prepare", racing_prepare)
+    reponse = _answer(crud, headers, enigme, id_joueur, "clé")
+    assert (reponse["correcte"], reponse["id_enigme"]) == (True, None)
+    assert calls == [{id_joueur: 5}, {}]
+    assert _score(id_joueur) == 0
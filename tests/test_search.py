@@ -0,0 +1,43 @@
+from sqlalchemy.dialects import postgresql
+
+from .. import search
+
+
+class _Recorder:
+    """Session factice : compile chaque requête pour Postgres, ne renvoie aucune ligne"""
+
+    def __init__(self):
+        self.compiled = []
+
+    def execute(self, statement):
+        self.compiled.append(statement.compile(dialect=postgresql.dialect()))
+        return self
+
+    def mappings(self):
+        return []
+
+
+def test_pg_trgm_query_compiles_for_postgres():
+    db = _Recorder()
+    assert search._search_pg_trgm(db, " Para_cé%tamol ", 5) == []
+    set_config, query = db.compiled
+
+    assert "set_config(" in str(set_config)
+    assert list(set_config.params.values()) == ["pg_trgm.similarity_threshold", str(search.SEARCH_THRESHOLD), True]
+
+    sql, params = str(query), set(query.params.values())
+    # Index GIN de la migration 6 : expressions lower(composition_n), opérateur % de pg_trgm
+    for name in search.COMPOSITIONS:
+        assert f"lower(medicaments.{name}) %% %(" in sql
+        assert f"similarity(lower(medicaments.{name}), %(" in sql
+    assert sql.count(" LIKE ") == 4 * len(search.COMPOSITIONS) and "ESCAPE '" in sql
+    assert "LEFT OUTER JOIN maladies ON maladies.id_medoc = medicaments.id_medoc" in sql
+    # Jokers de la saisie échappés dans les motifs LIKE, saisie brute pour la similarité
+    assert {"para\\_cé\\%tamol%", "% para\\_cé\\%tamol%", "para_cé%tamol"} <= params
+    assert 5 * len(search.COMPOSITIONS) in params
+
+
+def test_pg_trgm_skips_blank_queries():
+    db = _Recorder()
+    assert search._search_pg_trgm(db, "   ", 5) == []
+    assert db.compiled == []
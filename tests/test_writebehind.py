@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from .. import writebehind
+
+
+@pytest.fixture
+def write_behind(monkeypatch, tmp_path):
+    """File activée sans le thread de vidage : le test vide la file lui-même"""
+    dead_letters = tmp_path / "refusees.jsonl"
+    monkeypatch.setattr(writebehind, "WRITE_BEHIND", True)
+    monkeypatch.setattr(writebehind, "WRITE_BEHIND_DEAD_LETTER", str(dead_letters))
+    yield dead_letters
+    while not writebehind._queue.empty():
+        writebehind._queue.get_nowait()
+
+
+def test_failed_rows_are_reported(client, crud, make_user, write_behind):
+    id_joueur, headers = make_user("alice")
+    id_salle = crud.post("/salles", json={"name": "Labo"}, headers=headers).json()["id_salle"]
+    good = crud.post("/reponses", json={"id_salle": id_salle, "id_joueur": id_joueur, "reponse_saisie": "a"},
+                     headers=headers).json()
+    bad = crud.post("/reponses", json={"id_salle": id_salle, "id_joueur": id_joueur + 1000, "reponse_saisie": "b"},
+                    headers=headers).json()
+    assert client.get(f"/reponses/{good['id_resp']}/statut").json()["statut"] == "en_attente"
+
+    writebehind._flush(writebehind._next_batch())
+
+    assert client.get(f"/reponses/{good['id_resp']}/statut").json() == {
+        "id_resp": good["id_resp"], "statut": "enregistree", "erreur": None,
+    }
+    refused = client.get(f"/reponses/{bad['id_resp']}/statut").json()
+    assert refused["statut"] == "refusee" and "FOREIGN KEY" in refused["erreur"]
+    [line] = write_behind.read_text(encoding="utf-8").splitlines()
+    assert json.loads(line)["id_resp"] == bad["id_resp"]
+    assert client.get("/reponses/999999/statut").status_code == 404
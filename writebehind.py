@@ -0,0 +1,232 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+from fastapi import APIRouter, HTTPException
+from sqlalchemy import func, select, text
+from dotenv import load_dotenv
+
+from . import models, schemas, database, events, answers, scoring
+
+# Charger les variables d'environnement
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Écriture différée de POST /reponses : réponse mise en file, insérée par lots d'un seul INSERT multi-lignes.
+# Une réponse acceptée est visible en lecture après au plus WRITE_BEHIND_INTERVAL_MS.
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+WRITE_BEHIND_INTERVAL_MS = int(os.getenv("WRITE_BEHIND_INTERVAL_MS", 50))
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", 500))
+WRITE_BEHIND_QUEUE = int(os.getenv("WRITE_BEHIND_QUEUE", 10000))
+# Attente maximale (secondes) quand la file est pleine, avant de répondre 503
+WRITE_BEHIND_TIMEOUT = float(os.getenv("WRITE_BEHIND_TIMEOUT", 0.5))
+WRITE_BEHIND_ID_BLOCK = int(os.getenv("WRITE_BEHIND_ID_BLOCK", 1000))
+# Réponses refusées à l'insertion (ex : clé étrangère) : les WRITE_BEHIND_FAILED_KEEP dernières restent
+# consultables par GET /reponses/{id}/statut, et toutes sont ajoutées au fichier JSON lignes
+# WRITE_BEHIND_DEAD_LETTER s'il est défini
+WRITE_BEHIND_FAILED_KEEP = int(os.getenv("WRITE_BEHIND_FAILED_KEEP", 1000))
+WRITE_BEHIND_DEAD_LETTER = os.getenv("WRITE_BEHIND_DEAD_LETTER")
+
+router = APIRouter(tags=["Reponses"])
+
+
+class IdBlock:
+    """Identifiants id_resp réservés par blocs : un aller-retour en base pour WRITE_BEHIND_ID_BLOCK réponses"""
+
+    def __init__(self, size):
+        self.size = size
+        self._ids = deque()
+        self._next = None
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            if not self._ids:
+                self._ids.extend(self._allocate())
+            return self._ids.popleft()
+
+    def _allocate(self):
+        with database.engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                # Même séquence que le SERIAL : aucun conflit avec les autres workers ni les INSERT classiques
+                return conn.execute(
+                    text("SELECT nextval(pg_get_serial_sequence('responses', 'id_resp')) FROM generate_series(1, :n)"),
+                    {"n": self.size},
+                ).scalars().all()
+            # Sans séquence (SQLite, un seul processus) : compteur local à partir du plus grand id en base
+            if self._next is None:
+                self._next = (conn.execute(select(func.max(models.Responses.id_resp))).scalar() or 0) + 1
+            start, self._next = self._next, self._next + self.size
+            return range(start, self._next)
+
+
+_ids = IdBlock(WRITE_BEHIND_ID_BLOCK)
+_queue = queue.Queue(maxsize=WRITE_BEHIND_QUEUE)
+_stop = threading.Event()
+_thread = None
+_stats = {"accepted": 0, "rejected": 0, "flushed": 0, "batches": 0, "failed": 0}
+_stats_lock = threading.Lock()
+# id_resp acceptés mais pas encore insérés ; id_resp refusés -> (ligne, raison)
+_pending = set()
+_failed = OrderedDict()
+
+
+def _count(key, n=1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def submit(resp: schemas.ReponseCreate):
+    """Met la réponse en file et la renvoie avec son id ; 503 si la file reste pleine"""
+    row = {"id_resp": _ids.next(), **answers.with_correcte(resp.dict())}
+    with _stats_lock:
+        _pending.add(row["id_resp"])
+    try:
+        _queue.put(row, timeout=WRITE_BEHIND_TIMEOUT)
+    except queue.Full:
+        with _stats_lock:
+            _pending.discard(row["id_resp"])
+        _count("rejected")
+        raise HTTPException(status_code=503, detail="Trop de réponses en attente, réessayez")
+    _count("accepted")
+    return row
+
+
+# Vidage de la file
+
+def _insert(rows):
+    """INSERT multi-lignes et scores des joueurs, dans une transaction"""
+    with database.engine.connect() as conn:
+        scoring.insert_responses(conn, rows)
+
+
+def _flush(batch):
+    inserted = batch
+    try:
+        _insert(batch)
+    except Exception as exc:
+        # Une ligne invalide (ex : clé étrangère) ne doit pas faire perdre tout le lot
+        logger.warning("Lot de %s réponses refusé (%s), insertion ligne par ligne", len(batch), type(exc).__name__)
+        inserted = []
+        for row in batch:
+            try:
+                _insert([row])
+                inserted.append(row)
+            except Exception as row_exc:
+                _dead_letter(row, row_exc)
+    _settled(batch)
+    _count("flushed", len(inserted))
+    _count("batches")
+    _publish(inserted)
+
+
+def _dead_letter(row, exc):
+    reason = str(getattr(exc, "orig", exc))
+    logger.error("Réponse %s abandonnée (%s) : %r", row["id_resp"], reason, row)
+    with _stats_lock:
+        _stats["failed"] += 1
+        _failed[row["id_resp"]] = (row, reason)
+        while len(_failed) > WRITE_BEHIND_FAILED_KEEP:
+            _failed.popitem(last=False)
+    if WRITE_BEHIND_DEAD_LETTER:
+        try:
+            with open(WRITE_BEHIND_DEAD_LETTER, "a", encoding="utf-8") as dead_letters:
+                dead_letters.write(json.dumps({**row, "erreur": reason}, default=str, ensure_ascii=False) + "\n")
+        except OSError:
+            logger.exception("Écriture impossible dans %s", WRITE_BEHIND_DEAD_LETTER)
+
+
+def _settled(batch):
+    # Appelé après l'INSERT ou le refus : ces réponses sont désormais en base ou dans _failed
+    with _stats_lock:
+        _pending.difference_update(row["id_resp"] for row in batch)
+
+
+def _publish(batch):
+    if not batch:
+        return
+    with database.engine.connect() as conn:
+        games = dict(conn.execute(
+            select(models.Joueurs.id_joueur, models.Joueurs.id_game)
+            .where(models.Joueurs.id_joueur.in_({row["id_joueur"] for row in batch}))
+        ).all())
+    for row in batch:
+        events.reponse_created(games.get(row["id_joueur"]), row)
+
+
+def _next_batch():
+    """Bloque jusqu'à une première réponse, puis complète le lot jusqu'à WRITE_BEHIND_BATCH ou l'échéance"""
+    batch = [_queue.get(timeout=0.5)]
+    deadline = time.monotonic() + WRITE_BEHIND_INTERVAL_MS / 1000
+    while len(batch) < WRITE_BEHIND_BATCH:
+        remaining = 0 if _stop.is_set() else deadline - time.monotonic()
+        try:
+            batch.append(_queue.get(timeout=remaining) if remaining > 0 else _queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _run():
+    while True:
+        try:
+            batch = _next_batch()
+        except queue.Empty:
+            # Arrêt seulement une fois la file vide
+            if _stop.is_set():
+                return
+            continue
+        try:
+            _flush(batch)
+        except Exception:
+            logger.exception("Vidage de la file des réponses en échec")
+
+
+def start():
+    global _thread
+    if WRITE_BEHIND and _thread is None:
+        _stop.clear()
+        _thread = threading.Thread(target=_run, name="reponses-write-behind", daemon=True)
+        _thread.start()
+
+
+def stop():
+    """Vide la file de façon synchrone avant l'arrêt du worker"""
+    global _thread
+    if _thread is not None:
+        _stop.set()
+        _thread.join()
+        _thread = None
+
+
+def stats():
+    with _stats_lock:
+        return {"enabled": WRITE_BEHIND, "queue_depth": _queue.qsize(), "queue_max": WRITE_BEHIND_QUEUE, **_stats}
+
+
+def status(id_resp: int):
+    """"en_attente", "refusee" (avec la raison) ou None : à chercher en base"""
+    with _stats_lock:
+        if id_resp in _pending:
+            return {"statut": "en_attente"}
+        if id_resp in _failed:
+            return {"statut": "refusee", "erreur": _failed[id_resp][1]}
+    return None
+
+
+@router.get("/reponses/{id}/statut", response_model=schemas.ReponseStatut)
+def get_reponse_statut(id: int):
+    """Devenir d'une réponse acceptée par l'écriture différée (ou insérée directement)"""
+    statut = status(id)
+    if statut is None:
+        with database.engine.connect() as conn:
+            found = conn.execute(select(models.Responses.id_resp).where(models.Responses.id_resp == id)).first()
+        if found is None:
+            raise HTTPException(status_code=404, detail="Réponse introuvable")
+        statut = {"statut": "enregistree"}
+    return {"id_resp": id, **statut}